@@ -20,6 +20,7 @@ Pieter Abbeel (pabbeel@cs.berkeley.edu).
 # imports from python standard library
 import grading
 import imp
+from collections import defaultdict
 import optparse
 import os
 import re
@@ -99,11 +100,25 @@ def read_command(argv):
                       dest='just_lint',
                       action='store_true',
                       help='Just run linter.')
+    parser.add_option('--workers', '-w',
+                      dest='workers',
+                      type='int',
+                      default=1,
+                      help='Run test cases in this many worker processes '
+                           '(graphics are disabled when above 1)')
+    parser.add_option('--test-timeout',
+                      dest='test_timeout',
+                      type='int',
+                      default=1800,
+                      help='Seconds each test case may take when running '
+                           'with --workers')
     (options, args) = parser.parse_args(argv)
 
     if options.no_lint and options.just_lint:
         parser.error("options --no_lint and --just_lint"
                      " are mutually exclusive")
+    if options.workers < 1:
+        parser.error("option --workers must be at least 1")
 
     return options
 
@@ -229,11 +244,135 @@ def get_test_subdirs(test_parser, test_root, question_to_grade):
     return sorted(os.listdir(test_root))
 
 
+# test case functions shared with forked ParallelTestRunner workers
+_WORKER_TEST_FUNCTIONS = []
+
+
+def _run_test_in_worker(index, timeout):
+    """Run one registered test case function in a worker process.
+
+    Returns (result, recorder, error) where recorder holds the grading calls
+    and output of the test and error is a grading.WorkerException or None.
+    """
+    import traceback
+    import util
+    # every test sees the random state of a lone run with --test
+    random.seed(0)
+    recorder = grading.GradesRecorder()
+    result, error = None, None
+    old_stdout = sys.stdout
+    sys.stdout = recorder
+    try:
+        result = util.TimeoutFunction(_WORKER_TEST_FUNCTIONS[index],
+                                      timeout)(recorder)
+    except Exception as inst:
+        error = grading.WorkerException(str(inst), traceback.format_exc())
+    finally:
+        sys.stdout = old_stdout
+    return result, recorder, error
+
+
+class ParallelTestRunner:
+    """Run test cases in a pool of worker processes.
+
+    Test case functions are registered with add_test while the questions
+    are built; each registration returns a stand-in function that the
+    question calls in the usual order.  The stand-in waits for the worker's
+    result and replays its grading calls and output, so grades and output
+    come out in the same deterministic order as a serial run.
+
+    Questions with prerequisites are only sent to the workers once all of
+    their prerequisites are completed (see question_completed), so nothing
+    is run for a question that Grades.grade would skip.
+    """
+
+    def __init__(self, workers, timeout=1800):
+        """Create a runner.
+
+        Args:
+            workers: number of worker processes
+            timeout: max number of seconds for each test case
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.pool = None
+        self.tests = defaultdict(list)
+        self.prereqs = {}
+        self.completed = set()
+        self.submitted = set()
+        self.results = {}
+
+    def add_question(self, question, prereqs=()):
+        """Register a question and the questions it depends on."""
+        self.prereqs[question] = set(prereqs)
+
+    def add_test(self, question, function):
+        """Register a test case function of question.
+
+        Returns a function to add to the question in place of function.
+        """
+        index = len(_WORKER_TEST_FUNCTIONS)
+        _WORKER_TEST_FUNCTIONS.append(function)
+        self.tests[question].append(index)
+        return lambda grades: self.replay(question, index, grades)
+
+    def start(self):
+        """Start the workers and submit every question that is ready."""
+        import multiprocessing
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # forked workers inherit the student modules and test functions
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+        self.pool = context.Pool(self.workers)
+        self.submit_ready()
+
+    def close(self):
+        """Stop the workers."""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def submit_ready(self):
+        """Submit the tests of all questions whose prereqs are completed."""
+        for question in self.prereqs:
+            if (question not in self.submitted and
+                    self.prereqs[question] <= self.completed):
+                self.submitted.add(question)
+                for index in self.tests[question]:
+                    self.results[index] = self.pool.apply_async(
+                        _run_test_in_worker, (index, self.timeout))
+
+    def question_completed(self, question):
+        """Note that question got full credit and submit its dependents."""
+        self.completed.add(question)
+        self.submit_ready()
+
+    def replay(self, question, index, grades):
+        """Wait for a test case and replay it onto grades."""
+        if index not in self.results:
+            # only reached when grading ignores prerequisites
+            self.submitted.add(question)
+            self.results[index] = self.pool.apply_async(
+                _run_test_in_worker, (index, self.timeout))
+        result, recorder, error = self.results.pop(index).get()
+        recorder.replay(grades)
+        if error is not None:
+            raise error
+        return result
+
+
 def evaluate(generate_solutions, test_root, module_dict,
              edx_output=False, mute_output=False, gs_output=False,
              print_test_case=False, question_to_grade=None, display=None,
-             student_code=None, just_lint=False):
-    """Evaluate student code."""
+             student_code=None, just_lint=False, workers=1,
+             test_timeout=1800):
+    """Evaluate student code.
+
+    With workers above 1 the test cases run in that many worker processes
+    (see ParallelTestRunner), each limited to test_timeout seconds.
+    """
     # imports of testbench code.  note that the test_classes import must follow
     # the import of student code due to dependencies
     import test_parser
@@ -243,6 +382,9 @@ def evaluate(generate_solutions, test_root, module_dict,
 
     questions = []
     question_dicts = {}
+    test_runner = None
+    if workers > 1 and not generate_solutions:
+        test_runner = ParallelTestRunner(workers, test_timeout)
     test_subdirs = get_test_subdirs(test_parser, test_root, question_to_grade)
     for q in test_subdirs:
         subdir_path = os.path.join(test_root, q)
@@ -290,14 +432,20 @@ def evaluate(generate_solutions, test_root, module_dict,
                     else:
                         return lambda grades: test_case.execute(
                             grades, module_dict, solution_dict)
-            question.add_test_case(
-                test_case, makefun(test_case, solution_file))
+            test_function = makefun(test_case, solution_file)
+            if test_runner is not None:
+                test_function = test_runner.add_test(q, test_function)
+            question.add_test_case(test_case, test_function)
 
         # Note extra function is necessary for scoping reasons
         def makefun(question):
             return lambda grades: question.execute(grades)
         setattr(sys.modules[__name__], q, makefun(question))
         questions.append((q, question.max_points))
+        if test_runner is not None:
+            test_runner.add_question(
+                q, question_dict.get('depends', '').split()
+                if question_to_grade is None else ())
 
     grades = grading.Grades(project_params.PROJECT_NAME,
                             questions if not just_lint else [],
@@ -310,7 +458,17 @@ def evaluate(generate_solutions, test_root, module_dict,
             for prereq in question_dicts[q].get('depends', '').split():
                 grades.add_prereq(q, prereq)
 
-    grades.grade(sys.modules[__name__], bonus_pic=project_params.BONUS_PIC)
+    if test_runner is None:
+        grades.grade(sys.modules[__name__],
+                     bonus_pic=project_params.BONUS_PIC)
+    else:
+        test_runner.start()
+        try:
+            grades.grade(sys.modules[__name__],
+                         bonus_pic=project_params.BONUS_PIC,
+                         test_runner=test_runner)
+        finally:
+            test_runner.close()
     return grades.points
 
 
@@ -357,12 +515,14 @@ def main():
                  mute_output=options.mute_output,
                  print_test_case=options.print_test_case,
                  question_to_grade=options.grade_question,
-                 display=get_display(options.grade_question is not None,
-                                     options),
+                 display=get_display(options.grade_question is not None
+                                     and options.workers == 1, options),
                  student_code=(None if options.no_lint
                                or options.grade_question is not None
                                else options.student_code),
-                 just_lint=options.just_lint
+                 just_lint=options.just_lint,
+                 workers=options.workers,
+                 test_timeout=options.test_timeout
                  )
 
 
@@ -21,6 +21,54 @@ Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 import search
 import random
+import os
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+# PatternDatabases shared by every puzzle of the same size and pattern
+PATTERN_DATABASE_CACHE = {}
+
+# Directory for the on-disk PatternDatabase cache; None disables it
+PATTERN_DATABASE_CACHE_DIR = None
+
+# Disjoint tile patterns used by pattern_database_heuristic, by puzzle size
+DEFAULT_PATTERNS = {3: ((1, 2, 3, 4), (5, 6, 7, 8)),
+                    4: ((1, 2, 3, 4), (5, 6, 7, 8), (9, 10, 11, 12),
+                        (13, 14, 15))}
+
+
+# Per puzzle size: the moves out of every blank position, as an ordered
+# dict from move name to the blank's next position, and the goal board
+PUZZLE_MOVE_TABLES = {}
+
+
+def get_move_table(size):
+    """Return (moves, goal_board) for puzzles of the given side length.
+
+    moves[blank] maps each legal move, in the order 'up', 'down', 'left',
+    'right', to the position (row * size + col) the blank moves to.
+    Tables are built once per size and shared through PUZZLE_MOVE_TABLES.
+    """
+    if size not in PUZZLE_MOVE_TABLES:
+        moves = []
+        for blank in range(size * size):
+            row, col = divmod(blank, size)
+            blank_moves = {}
+            if(row != 0):
+                blank_moves['up'] = blank - size
+            if(row != size - 1):
+                blank_moves['down'] = blank + size
+            if(col != 0):
+                blank_moves['left'] = blank - 1
+            if(col != size - 1):
+                blank_moves['right'] = blank + 1
+            moves.append(blank_moves)
+        goal_board = 0
+        for position in range(size * size):
+            goal_board |= position << (4 * position)
+        PUZZLE_MOVE_TABLES[size] = (moves, goal_board)
+    return PUZZLE_MOVE_TABLES[size]
 
 
 class EightPuzzleState:
@@ -28,8 +76,13 @@ class EightPuzzleState:
 
     Note: The task of recasting this puzzle as a search problem is left to
     the EightPuzzleSearchProblem class.
+
+    The 15-puzzle works the same way, from 16 numbers.  Larger puzzles are
+    not supported, as every tile is packed into 4 bits.
     """
 
+    __slots__ = ('size', 'board', 'blank')
+
     def __init__(self, numbers):
         """Construct a new eight puzzle from an ordering of numbers.
 
@@ -48,18 +101,35 @@ class EightPuzzleState:
             | 6 | 7 | 8 |
             ------------
 
-        The configuration of the puzzle is stored in a 2-dimensional
-        list (a list of lists) 'cells'.
+        The configuration of the puzzle is packed into the single int
+        'board', 4 bits per position in row-major order, and the blank's
+        position (row * size + col) is kept in 'blank'.  Its side length,
+        3 for the eight puzzle, is stored in 'size'.
+
+        Raises ValueError for puzzles larger than the 15-puzzle, whose tiles
+        do not fit in 4 bits.
         """
-        self.cells = []
-        numbers = numbers[:]  # Make a copy so as not to cause side-effects.
-        numbers.reverse()
-        for row in range(3):
-            self.cells.append([])
-            for col in range(3):
-                self.cells[row].append(numbers.pop())
-                if self.cells[row][col] == 0:
-                    self.blank_location = row, col
+        self.size = int(round(len(numbers) ** 0.5))
+        if self.size > 4:
+            raise ValueError('Puzzles larger than the 15-puzzle are not '
+                             'supported: %d numbers' % len(numbers))
+        self.board = 0
+        for position, number in enumerate(numbers):
+            self.board |= number << (4 * position)
+            if number == 0:
+                self.blank = position
+
+    @property
+    def cells(self):
+        """The configuration as a 2-dimensional list (a list of lists)."""
+        tiles = self.get_tiles()
+        return [list(tiles[row * self.size:(row + 1) * self.size])
+                for row in range(self.size)]
+
+    @property
+    def blank_location(self):
+        """The (row, col) of the blank."""
+        return divmod(self.blank, self.size)
 
     def is_goal(self):
         """Check to see if the puzzle is in its goal state.
@@ -80,13 +150,7 @@ class EightPuzzleState:
         False
 
         """
-        current = 0
-        for row in range(3):
-            for col in range(3):
-                if current != self.cells[row][col]:
-                    return False
-                current += 1
-        return True
+        return self.board == get_move_table(self.size)[1]
 
     def legal_moves(self):
         """Return a list of legal moves from the current state.
@@ -99,17 +163,7 @@ class EightPuzzleState:
         ['down', 'right']
 
         """
-        moves = []
-        row, col = self.blank_location
-        if(row != 0):
-            moves.append('up')
-        if(row != 2):
-            moves.append('down')
-        if(col != 0):
-            moves.append('left')
-        if(col != 2):
-            moves.append('right')
-        return moves
+        return list(get_move_table(self.size)[0][self.blank])
 
     def result(self, move):
         """Return a new EightPuzzle after executing the given move.
@@ -118,35 +172,23 @@ class EightPuzzleState:
         updated based on the provided move.
 
         The move should be a string drawn from a list returned by legal_moves.
-        Illegal moves will raise an exception, which may be an array bounds
-        exception.
+        Illegal moves will raise an exception.
 
         NOTE: This function *does not* change the current object.  Instead,
         it returns a new object.
         """
-        row, col = self.blank_location
-        if(move == 'up'):
-            newrow = row - 1
-            newcol = col
-        elif(move == 'down'):
-            newrow = row + 1
-            newcol = col
-        elif(move == 'left'):
-            newrow = row
-            newcol = col - 1
-        elif(move == 'right'):
-            newrow = row
-            newcol = col + 1
-        else:
+        try:
+            blank = get_move_table(self.size)[0][self.blank][move]
+        except KeyError:
             raise Exception("Illegal Move")
 
-        # Create a copy of the current EightPuzzle
-        new_puzzle = EightPuzzleState([0, 0, 0, 0, 0, 0, 0, 0, 0])
-        new_puzzle.cells = [values[:] for values in self.cells]
-        # And update it to reflect the move
-        new_puzzle.cells[row][col] = self.cells[newrow][newcol]
-        new_puzzle.cells[newrow][newcol] = self.cells[row][col]
-        new_puzzle.blank_location = newrow, newcol
+        # Move the tile at the blank's new position to its old one
+        tile = (self.board >> (4 * blank)) & 15
+        new_puzzle = EightPuzzleState.__new__(EightPuzzleState)
+        new_puzzle.size = self.size
+        new_puzzle.board = (self.board - (tile << (4 * blank)) +
+                            (tile << (4 * self.blank)))
+        new_puzzle.blank = blank
 
         return new_puzzle
 
@@ -162,26 +204,36 @@ class EightPuzzleState:
         True
 
         """
-        for row in range(3):
-            if self.cells[row] != other.cells[row]:
-                return False
-        return True
+        return self.board == other.board and self.size == other.size
 
     def __hash__(self):
         """Overload hash function to be based on puzzle configuration."""
-        return hash(str(self.cells))
+        return hash(self.board)
+
+    def get_tiles(self):
+        """Return the numbers on the puzzle as a tuple, row by row.
+
+        Example:
+        >>> EightPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]).get_tiles()
+        (1, 0, 2, 3, 4, 5, 6, 7, 8)
+
+        """
+        board = self.board
+        return tuple((board >> shift) & 15
+                     for shift in range(0, 4 * self.size * self.size, 4))
 
     def __str__(self):
         """Return a display string for the maze."""
         lines = []
-        horizontal_line = ('-' * (13))
+        width = len(str(self.size * self.size - 1))
+        horizontal_line = ('-' * ((width + 3) * self.size + 1))
         lines.append(horizontal_line)
         for row in self.cells:
             row_line = '|'
             for col in row:
                 if col == 0:
                     col = ' '
-                row_line = row_line + ' ' + col.__str__() + ' |'
+                row_line = row_line + ' ' + col.__str__().rjust(width) + ' |'
             lines.append(row_line)
             lines.append(horizontal_line)
         return '\n'.join(lines)
@@ -277,7 +329,7 @@ def load_eight_puzzle(puzzle_number):
     return EightPuzzleState(EIGHT_PUZZLE_DATA[puzzle_number])
 
 
-def create_random_eight_puzzle(moves=100):
+def create_random_eight_puzzle(moves=100, size=3):
     """Create a random eight puzzle by applying a sequence of random moves.
 
     Starting with solved puzzle, applies 'moves' moves randomly chosen from
@@ -285,14 +337,222 @@ def create_random_eight_puzzle(moves=100):
 
     Args:
         moves (int): number of random moves to apply
+        size (int): side length of the puzzle, 4 for the 15-puzzle (the
+                    largest supported)
     """
-    puzzle = EightPuzzleState([0, 1, 2, 3, 4, 5, 6, 7, 8])
+    puzzle = EightPuzzleState(list(range(size * size)))
     for i in range(moves):
         # Execute a random legal move
         puzzle = puzzle.result(random.choice(puzzle.legal_moves()))
     return puzzle
 
 
+def manhattan_heuristic(state, problem=None):
+    """Return the sum of the Manhattan distances of the tiles to their goals.
+
+    The blank is not counted.  Works for the eight puzzle and the 15-puzzle.
+    """
+    size = state.size
+    total = 0
+    for index, tile in enumerate(state.get_tiles()):
+        if tile:
+            total += (abs(index // size - tile // size) +
+                      abs(index % size - tile % size))
+    return total
+
+
+def longest_increasing_subsequence(values):
+    """Return the length of the longest increasing subsequence of values."""
+    tails = []
+    for value in values:
+        i = bisect_left(tails, value)
+        if i == len(tails):
+            tails.append(value)
+        else:
+            tails[i] = value
+    return len(tails)
+
+
+def linear_conflict_heuristic(state, problem=None):
+    """Return the Manhattan distance plus two moves per linear conflict.
+
+    Tiles that are in their goal row but in the wrong order among
+    themselves cannot all pass each other within the row: at least all but
+    the longest correctly ordered subsequence of them must leave the row
+    and come back, costing two moves each on top of their Manhattan
+    distance.  Columns are handled the same way.
+    """
+    size = state.size
+    tiles = state.get_tiles()
+    extra = 0
+    for line in range(size):
+        # goal columns of the tiles in this row that belong in this row
+        in_row = [tile % size for tile in tiles[line * size:(line + 1) * size]
+                  if tile and tile // size == line]
+        # goal rows of the tiles in this column that belong in this column
+        in_col = [tile // size for tile in tiles[line::size]
+                  if tile and tile % size == line]
+        extra += len(in_row) - longest_increasing_subsequence(in_row)
+        extra += len(in_col) - longest_increasing_subsequence(in_col)
+    return manhattan_heuristic(state) + 2 * extra
+
+
+class PatternDatabase:
+    """Exact cost of moving a subset of the tiles home, ignoring the rest.
+
+    For the tiles in pattern, a backward breadth first search from the goal
+    over the positions of those tiles and the blank finds how many moves of
+    pattern tiles any placement of them needs (moves of the other tiles are
+    free).  The costs are stored in an array of unsigned bytes indexed by
+    the pattern tiles' positions and the blank's position.
+
+    The costs of disjoint patterns count disjoint sets of moves, so they can
+    be added up into an admissible heuristic (see pattern_database_heuristic).
+    As the blank's position is part of the index, a move changes the cost of
+    the pattern holding the moved tile by at most one and leaves the others
+    unchanged, so the sum is also consistent.
+    """
+
+    UNKNOWN = 0xFF
+
+    def __init__(self, size, pattern, cache_dir=None):
+        """Compute (or load from cache_dir) the database for pattern.
+
+        Args:
+            size (int): side length of the puzzle
+            pattern: the tiles (numbers 1 to size * size - 1) to track
+            cache_dir: directory to cache the database in, or None
+        """
+        self.size = size
+        self.pattern = tuple(pattern)
+        self.key = '%d-%s' % (size, '-'.join(str(t) for t in self.pattern))
+
+        self.table = None
+        if cache_dir is not None:
+            self.table = self._load(cache_dir)
+        if self.table is None:
+            self.table = self._compute()
+            if cache_dir is not None:
+                self._save(cache_dir)
+
+    def get_index(self, positions):
+        """Return the table index of the pattern tiles' and blank's positions.
+
+        positions maps every tile to its position (row * size + col), as a
+        list indexed by tile, with the blank as tile 0.
+        """
+        cells = self.size * self.size
+        index = 0
+        for tile in self.pattern:
+            index = index * cells + positions[tile]
+        return index * cells + positions[0]
+
+    def get_cost(self, positions):
+        """Return the cost for the pattern tiles' positions (see get_index)."""
+        return self.table[self.get_index(positions)]
+
+    def _compute(self):
+        """Run the backward search from the goal and return the cost table.
+
+        The search is a 0-1 breadth first search, as moving the blank onto
+        a tile outside the pattern is free.
+        """
+        size = self.size
+        cells = size * size
+        neighbors = []
+        for cell in range(cells):
+            row, col = divmod(cell, size)
+            neighbors.append(tuple(
+                r * size + c for r, c in
+                ((row - 1, col), (row + 1, col),
+                 (row, col - 1), (row, col + 1))
+                if 0 <= r < size and 0 <= c < size))
+
+        table = array('B', [PatternDatabase.UNKNOWN]) * cells ** (
+            len(self.pattern) + 1)
+
+        # in the goal tile t is at position t and the blank at position 0
+        fringe = deque([(self.pattern, 0, 0)])
+        while fringe:
+            positions, blank, cost = fringe.popleft()
+            index = 0
+            for position in positions:
+                index = index * cells + position
+            index = index * cells + blank
+            if table[index] != PatternDatabase.UNKNOWN:
+                # states come off the fringe in order of cost
+                continue
+            table[index] = cost
+
+            for cell in neighbors[blank]:
+                if cell in positions:
+                    # the blank swaps places with a pattern tile
+                    i = positions.index(cell)
+                    fringe.append((positions[:i] + (blank,) +
+                                   positions[i + 1:], cell, cost + 1))
+                else:
+                    fringe.appendleft((positions, cell, cost))
+        return table
+
+    def _cache_file(self, cache_dir):
+        """Return the path of the cache file for this pattern."""
+        return os.path.join(cache_dir, 'pattern-database-%s.bin' % self.key)
+
+    def _load(self, cache_dir):
+        """Return the table stored in cache_dir or None if missing/invalid."""
+        path = self._cache_file(cache_dir)
+        if not os.path.exists(path):
+            return None
+        table = array('B')
+        with open(path, 'rb') as f:
+            table.frombytes(f.read())
+        if len(table) != (self.size * self.size) ** (len(self.pattern) + 1):
+            return None
+        return table
+
+    def _save(self, cache_dir):
+        """Write the table to cache_dir, ignoring unwritable directories."""
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            with open(self._cache_file(cache_dir), 'wb') as f:
+                self.table.tofile(f)
+        except OSError:
+            pass
+
+
+def get_pattern_databases(size, patterns=None):
+    """Return the PatternDatabases of disjoint patterns for a puzzle size.
+
+    patterns defaults to DEFAULT_PATTERNS[size].  Databases are built once
+    and shared through PATTERN_DATABASE_CACHE (and
+    PATTERN_DATABASE_CACHE_DIR on disk, if set).
+    """
+    if patterns is None:
+        patterns = DEFAULT_PATTERNS[size]
+    databases = []
+    for pattern in patterns:
+        key = (size, tuple(pattern))
+        if key not in PATTERN_DATABASE_CACHE:
+            PATTERN_DATABASE_CACHE[key] = PatternDatabase(
+                size, pattern, PATTERN_DATABASE_CACHE_DIR)
+        databases.append(PATTERN_DATABASE_CACHE[key])
+    return databases
+
+
+def pattern_database_heuristic(state, problem=None):
+    """Return the sum of the default disjoint pattern database costs.
+
+    Admissible and consistent, and never below manhattan_heuristic.
+    """
+    tiles = state.get_tiles()
+    positions = [0] * len(tiles)
+    for index, tile in enumerate(tiles):
+        positions[tile] = index
+    return sum(database.get_cost(positions)
+               for database in get_pattern_databases(state.size))
+
+
 def main():
     """Run simple test using BFS to solve random puzzle."""
     puzzle = create_random_eight_puzzle(25)
@@ -112,7 +112,7 @@ class Configuration:
 
     def __hash__(self):
         """Override hash function to use position and direction."""
-        return hash(str(self))
+        return hash((self.position, self.direction))
 
     def __str__(self):
         """Return string of this Configuration."""
@@ -158,15 +158,24 @@ class AgentState:
             return ("Ghost: " + str(self.configuration) + "; " +
                     str(self.scared_timer))
 
+    def _key(self):
+        """Return the fields compared by == and hash, as a tuple.
+
+        As in __str__, a pacman's scared timer is left out.
+        """
+        if self.is_pacman:
+            return (True, self.configuration)
+        return (False, self.configuration, self.scared_timer)
+
     def __eq__(self, other):
         """Override == operator to consider configuration and scared timer."""
-        if other is None:
+        if not isinstance(other, AgentState):
             return False
-        return str(self) == str(other)
+        return self._key() == other._key()
 
     def __hash__(self):
         """Override hash to consider configuration and scared timer."""
-        return hash(str(self))
+        return hash(self._key())
 
     def copy(self):
         """Copy all state information."""
@@ -330,6 +339,158 @@ class Grid:
         return bools
 
 
+class BitGrid(Grid):
+    """A 2-D array of booleans backed by a single Python int bitmask.
+
+    Has the same grid[x][y] interface as Grid, where cell (x, y) is stored in
+    bit x * height + y of self.bits.  That is the same order Grid.__hash__
+    folds its cells in, so a BitGrid hashes (and compares) equal to a Grid
+    holding the same values.
+
+    Since ints are immutable, copy, count, hash and equality work on the
+    whole mask at once instead of walking every cell in Python.
+    """
+
+    def __init__(self, width, height, initial_value=False,
+                 bit_representation=None):
+        """Create BitGrid of given size.
+
+        If bit_representation is given then values filled in from that
+        """
+        if initial_value not in [False, True]:
+            raise Exception('Grids can only contain booleans')
+        self.CELLS_PER_INT = 30
+
+        self.width = width
+        self.height = height
+        self.mask = (1 << (width * height)) - 1
+        self.bits = self.mask if initial_value else 0
+        if bit_representation:
+            self._unpack_bits(bit_representation)
+
+    @property
+    def data(self):
+        """Return the grid as a list of lists (a snapshot, not a view)."""
+        return [[self[x][y] for y in range(self.height)]
+                for x in range(self.width)]
+
+    def __getitem__(self, i):
+        """Return a view of column i supporting [y] get and set."""
+        if i < 0:
+            i += self.width
+        if not 0 <= i < self.width:
+            raise IndexError('grid index out of range')
+        return _BitColumn(self, i)
+
+    def __setitem__(self, key, item):
+        """Set column key from a sequence of booleans."""
+        column = self[key]
+        for y, value in enumerate(item):
+            column[y] = value
+
+    def __str__(self):
+        """Return string representation of grid oriented like Pacman board."""
+        out = [[str(self[x][y])[0] for x in range(self.width)]
+               for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+    def __eq__(self, other):
+        """Override == to return True if data are equal."""
+        if other is None:
+            return False
+        if isinstance(other, BitGrid):
+            return (self.bits == other.bits and self.width == other.width
+                    and self.height == other.height)
+        return self.data == other.data
+
+    def __hash__(self):
+        """Compute hash of grid."""
+        return hash(self.bits)
+
+    def copy(self):
+        """Make a copy of this grid."""
+        g = BitGrid.__new__(BitGrid)
+        g.CELLS_PER_INT = self.CELLS_PER_INT
+        g.width = self.width
+        g.height = self.height
+        g.mask = self.mask
+        g.bits = self.bits
+        return g
+
+    def shallow_copy(self):
+        """Make a shallow copy of this grid (same as copy).
+
+        The bits are an immutable int, so a copy is already as cheap as
+        sharing a reference.
+        """
+        return self.copy()
+
+    def count(self, item=True):
+        """Return number of items in the grid."""
+        set_bits = bin(self.bits).count('1')
+        if item:
+            return set_bits
+        return self.width * self.height - set_bits
+
+    def as_list(self, key=True):
+        """Return list containing (x, y) tuples of key locations."""
+        bits = self.bits if key else self.mask & ~self.bits
+        height = self.height
+        list = []
+        while bits:
+            low_bit = bits & -bits
+            list.append(divmod(low_bit.bit_length() - 1, height))
+            bits ^= low_bit
+        return list
+
+    @staticmethod
+    def from_grid(grid):
+        """Return a BitGrid holding the same values as the given Grid."""
+        g = BitGrid(grid.width, grid.height)
+        bit = 1
+        for column in grid.data:
+            for value in column:
+                if value:
+                    g.bits |= bit
+                bit <<= 1
+        return g
+
+
+class _BitColumn:
+    """View of a single column of a BitGrid, as returned by grid[x]."""
+
+    __slots__ = ('grid', 'offset')
+
+    def __init__(self, grid, x):
+        """Create a view of column x of grid."""
+        self.grid = grid
+        self.offset = x * grid.height
+
+    def __getitem__(self, y):
+        """Return the value stored at row y."""
+        if y < 0:
+            y += self.grid.height
+        if not 0 <= y < self.grid.height:
+            raise IndexError('grid index out of range')
+        return (self.grid.bits >> (self.offset + y)) & 1 == 1
+
+    def __setitem__(self, y, value):
+        """Store value at row y."""
+        if y < 0:
+            y += self.grid.height
+        if not 0 <= y < self.grid.height:
+            raise IndexError('grid index out of range')
+        if value:
+            self.grid.bits |= 1 << (self.offset + y)
+        else:
+            self.grid.bits &= ~(1 << (self.offset + y))
+
+    def __len__(self):
+        """Return the height of the column."""
+        return self.grid.height
+
+
 def reconstitute_grid(bit_representation):
     """Reconstitute Grid from given bit_representation."""
     if not isinstance(bit_representation, tuple):
@@ -390,8 +551,17 @@ class Actions:
         return (dx * speed, dy * speed)
 
     @staticmethod
-    def get_possible_actions(config, walls):
-        """Return possible actions from given config and walls position."""
+    def get_possible_actions(config, walls, move_table=None):
+        """Return possible actions from given config and walls position.
+
+        If the layout's move_table (see layout.MoveTable) is given, integer
+        positions are answered by lookup; fractional positions, such as
+        those of slowed-down scared ghosts, are always computed.
+        """
+        if move_table is not None:
+            actions = move_table.possible_actions.get(config.position)
+            if actions is not None:
+                return list(actions)
         possible = []
         x, y = config.position
         x_int, y_int = int(x + 0.5), int(y + 0.5)
@@ -410,8 +580,16 @@ class Actions:
         return possible
 
     @staticmethod
-    def get_legal_neighbors(position, walls):
-        """Return list of possible neighbors from given position."""
+    def get_legal_neighbors(position, walls, move_table=None):
+        """Return list of possible neighbors from given position.
+
+        Integer positions are looked up in move_table (see layout.MoveTable)
+        when it is given.
+        """
+        if move_table is not None:
+            neighbors = move_table.legal_neighbors.get(position)
+            if neighbors is not None:
+                return list(neighbors)
         x, y = position
         x_int, y_int = int(x + 0.5), int(y + 0.5)
         neighbors = []
@@ -436,17 +614,44 @@ class Actions:
 
 
 class GameStateData:
-    """Complete state of game."""
+    """Complete state of game.
+
+    Copies are copy-on-write: a copy shares the food grid, the capsule and
+    _eaten lists, the agent states and the layout with the state it was
+    made from, and code changing the state must replace these rather than
+    mutate them in place.  Agent states are changed through
+    get_mutable_agent_state, which clones a shared agent state the first
+    time it is changed; the other parts are replaced wholesale when changed
+    (see pacman.PacmanRules.consume), so copying a state for an agent that
+    only reads it is cheap.
+
+    The number of pellets left is kept in num_food, and food_positions is
+    either None or a frozenset of their positions (see
+    pacman.GameState.get_food_positions); both are updated as pellets are
+    eaten instead of being recounted from the food grid.
+
+    Once a state is complete it is frozen (see freeze), after which its
+    hash is computed once and cached, and comparing it with another frozen
+    state of a different hash fails without looking at the fields.
+    """
 
     def __init__(self, prev_state=None):
-        """Generate a new data packet by copying information from previous."""
+        """Generate a new data packet sharing information with previous."""
         if prev_state is not None:
-            self.food = prev_state.food.shallow_copy()
-            self.capsules = prev_state.capsules[:]
-            self.agent_states = self.copy_agent_states(prev_state.agent_states)
+            self.food = prev_state.food
+            self.num_food = prev_state.num_food
+            self.food_positions = prev_state.food_positions
+            self.capsules = prev_state.capsules
+            self.agent_states = prev_state.agent_states[:]
             self.layout = prev_state.layout
             self._eaten = prev_state._eaten
             self.score = prev_state.score
+            # the agent states are now shared by both, so neither may
+            # change them in place any more
+            prev_state._owned_agents = set()
+        self._owned_agents = set()
+        self._frozen = False
+        self._hash = None
 
         self._food_eaten = None
         self._food_added = None
@@ -457,10 +662,12 @@ class GameStateData:
         self.score_change = 0
 
     def deep_copy(self):
-        """Create deep copy of this object."""
+        """Create a copy of this object that is independent of it.
+
+        Being copy-on-write, the copy shares everything with this object
+        until one of them is changed.
+        """
         state = GameStateData(self)
-        state.food = self.food.deep_copy()
-        state.layout = self.layout.deep_copy()
         state._agent_moved = self._agent_moved
         state._food_eaten = self._food_eaten
         state._food_added = self._food_added
@@ -474,11 +681,40 @@ class GameStateData:
             copied_states.append(agent_state.copy())
         return copied_states
 
+    def get_mutable_agent_state(self, index):
+        """Return the agent state at index for changing it in place.
+
+        The first time a shared agent state is asked for it is replaced by a
+        private copy, so other states sharing it are not affected.
+        """
+        if index not in self._owned_agents:
+            self.agent_states[index] = self.agent_states[index].copy()
+            self._owned_agents.add(index)
+        # the state is about to change, so its hash may not be cached
+        self._frozen = False
+        self._hash = None
+        return self.agent_states[index]
+
+    def freeze(self):
+        """Mark the state as complete, allowing its hash to be cached.
+
+        Called once the rules are done with a state (see
+        pacman.GameState.generate_successor); the state must not be changed
+        afterwards other than through get_mutable_agent_state.
+        """
+        self._frozen = True
+
     def __eq__(self, other):
         """Override == to compare two states."""
         if other is None:
             return False
+        if self is other:
+            return True
         # TODO Check for type of other
+        other_hash = getattr(other, '_hash', None)
+        if (self._hash is not None and other_hash is not None and
+                self._hash != other_hash):
+            return False
         if not self.agent_states == other.agent_states:
             return False
         if not self.food == other.food:
@@ -490,16 +726,17 @@ class GameStateData:
         return True
 
     def __hash__(self):
-        """Allow states to be keys of dictionaries."""
-        for i, state in enumerate(self.agent_states):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                # hash(state)
-        return int((hash(tuple(self.agent_states)) + 13 * hash(self.food) +
-                    113 * hash(tuple(self.capsules)) + 7 * hash(self.score))
-                   % 1048575)
+        """Allow states to be keys of dictionaries.
+
+        The hash of a frozen state is cached.
+        """
+        if self._hash is not None:
+            return self._hash
+        value = hash((tuple(self.agent_states), self.food,
+                      tuple(self.capsules), self.score))
+        if self._frozen:
+            self._hash = value
+        return value
 
     def __str__(self):
         """Generate string representation of state."""
@@ -563,6 +800,8 @@ class GameStateData:
         See layout.py
         """
         self.food = layout.food.copy()
+        self.num_food = layout.total_food
+        self.food_positions = None
         # self.capsules = []
         self.capsules = layout.capsules[:]
         self.layout = layout
@@ -570,6 +809,7 @@ class GameStateData:
         self.score_change = 0
 
         self.agent_states = []
+        self._owned_agents = set()
         num_ghosts = 0
         for is_pacman, pos in layout.agent_positions:
             if not is_pacman:
@@ -581,6 +821,8 @@ class GameStateData:
                                                               Directions.STOP),
                                                 is_pacman))
         self._eaten = [False for a in self.agent_states]
+        self._hash = None
+        self.freeze()
 
 
 try:
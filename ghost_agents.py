@@ -68,11 +68,19 @@ class RandomGhost(GhostAgent):
 class DirectionalGhost(GhostAgent):
     """A ghost that prefers to rush Pacman, or flee when scared."""
 
-    def __init__(self, index, prob_attack=0.8, prob_scared_flee=0.8):
-        """Override GhostAgent.__init__ to take probabilities."""
+    def __init__(self, index, prob_attack=0.8, prob_scared_flee=0.8,
+                 use_maze_distance=False):
+        """Override GhostAgent.__init__ to take probabilities.
+
+        If use_maze_distance is True the ghost measures how far it is from
+        Pacman with exact maze distances (from the layout's MazeDistances
+        oracle) instead of Manhattan distance.  Cells Pacman cannot be
+        reached from count as infinitely far away.
+        """
         super().__init__(index)
         self.prob_attack = prob_attack
         self.prob_scared_flee = prob_scared_flee
+        self.use_maze_distance = use_maze_distance
 
     def get_distribution(self, state):
         """Read variables from state."""
@@ -92,8 +100,20 @@ class DirectionalGhost(GhostAgent):
         pacman_position = state.get_pacman_position()
 
         # Select best actions given the state
-        distances_to_pacman = [manhattan_distance(pos, pacman_position)
-                               for pos in new_positions]
+        if self.use_maze_distance:
+            # scared ghosts move at half speed, so snap to the grid first
+            maze_distances = state.get_maze_distances()
+            pacman_cell = util.nearest_point(pacman_position)
+            distances_to_pacman = []
+            for pos in new_positions:
+                distance = maze_distances.get_distance(
+                    util.nearest_point(pos), pacman_cell)
+                if distance is None:
+                    distance = float('inf')
+                distances_to_pacman.append(distance)
+        else:
+            distances_to_pacman = [manhattan_distance(pos, pacman_position)
+                                   for pos in new_positions]
         if is_scared:
             best_score = max(distances_to_pacman)
             best_prob = self.prob_scared_flee
@@ -67,12 +67,17 @@ class Grades:
         """Add a prereq to the given question."""
         self.prereqs[question].add(prereq)
 
-    def grade(self, grading_module, exception_map={}, bonus_pic=False):
+    def grade(self, grading_module, exception_map={}, bonus_pic=False,
+              test_runner=None):
         """Grade each question.
 
         Args:
             grading_module: the module with all the grading functions
                 (pass in with sys.modules[__name__])
+            test_runner: optional runner executing the test cases in worker
+                processes; it enforces a timeout per test case instead of
+                the per-question SIGALRM, and is told about every completed
+                question so that it can start the questions depending on it
         """
         completed_questions = set([])
         for q in self.questions:
@@ -95,7 +100,11 @@ working on Question %s,\n\
 
             try:
                 # Call the question's function
-                util.TimeoutFunction(getattr(grading_module, q), 1800)(self)
+                if test_runner is None:
+                    util.TimeoutFunction(getattr(grading_module, q),
+                                         1800)(self)
+                else:
+                    getattr(grading_module, q)(self)
             except Exception as inst:
                 self.add_exception_message(q, inst, traceback)
                 self.add_error_hints(exception_map, inst, q[1])
@@ -105,6 +114,8 @@ working on Question %s,\n\
 
             if self.points[q] >= self.maxes[q]:
                 completed_questions.add(q)
+                if test_runner is not None:
+                    test_runner.question_completed(q)
 
             print('\n### Question %s: %d/%d ###\n' %
                   (q, self.points[q], self.maxes[q]))
@@ -221,7 +232,11 @@ modify, and
         """Format the exception message."""
         self.fail('FAIL: Exception raised: %s' % inst)
         self.add_message('')
-        for line in traceback.format_exc().split('\n'):
+        if isinstance(inst, WorkerException):
+            formatted = inst.formatted_traceback
+        else:
+            formatted = traceback.format_exc()
+        for line in formatted.split('\n'):
             self.add_message(line)
 
     def add_error_hints(self, exception_map, error_instance, question_num):
@@ -392,6 +407,84 @@ modify, and
                     check, module))
 
 
+class WorkerException(Exception):
+    """An exception raised by a test case run in a worker process.
+
+    The original exception may not survive pickling, so only its message
+    and formatted traceback are sent back to the grading process.
+    """
+
+    def __init__(self, message, formatted_traceback):
+        """Create a WorkerException.
+
+        Args:
+            message: str() of the original exception
+            formatted_traceback: the worker's traceback.format_exc()
+        """
+        Exception.__init__(self, message, formatted_traceback)
+        self.message = message
+        self.formatted_traceback = formatted_traceback
+
+    def __str__(self):
+        """Return the original exception's message."""
+        return self.message
+
+
+class GradesRecorder:
+    """Stand-in for Grades that records grading calls for later replay.
+
+    Test cases run in worker processes are handed a GradesRecorder.  The
+    calls they make, and everything they print, are recorded in order so
+    the grading process can replay them onto the real Grades, which keeps
+    the output identical to a serial run.
+    """
+
+    def __init__(self):
+        """Create an empty recording."""
+        self.events = []
+
+    def write(self, text):
+        """Record printed output (lets the recorder stand in for stdout)."""
+        if text:
+            self.events.append(('write', (text,)))
+
+    def flush(self):
+        """Do nothing; the recording is flushed by replay."""
+        pass
+
+    def fail(self, message, raw=False):
+        """Record a call to Grades.fail."""
+        self.events.append(('fail', (message, raw)))
+
+    def assign_zero_credit(self):
+        """Record a call to Grades.assign_zero_credit."""
+        self.events.append(('assign_zero_credit', ()))
+
+    def add_points(self, amt):
+        """Record a call to Grades.add_points."""
+        self.events.append(('add_points', (amt,)))
+
+    def deduct_points(self, amt):
+        """Record a call to Grades.deduct_points."""
+        self.events.append(('deduct_points', (amt,)))
+
+    def assign_full_credit(self, message="", raw=False):
+        """Record a call to Grades.assign_full_credit."""
+        self.events.append(('assign_full_credit', (message, raw)))
+
+    def add_message(self, message, raw=False):
+        """Record a call to Grades.add_message."""
+        self.events.append(('add_message', (message, raw)))
+
+    def replay(self, grades):
+        """Apply the recorded calls and output to grades, in order."""
+        for name, args in self.events:
+            if name == 'write':
+                sys.stdout.write(*args)
+            else:
+                getattr(grades, name)(*args)
+
+
 class Counter(dict):
     """Dict with default 0."""
 
@@ -19,12 +19,31 @@ Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 from util import manhattan_distance
 from game import Grid
+from game import BitGrid
+from game import Directions
+from game import Actions
+from game import Configuration
 import os
 import random
+import hashlib
+from array import array
+from collections import deque
 from functools import reduce
 
 VISIBILITY_MATRIX_CACHE = {}
 
+# MazeDistances tables shared by every Layout with the same walls
+MAZE_DISTANCE_CACHE = {}
+
+# Directory for the on-disk MazeDistances cache; None disables it
+MAZE_DISTANCE_CACHE_DIR = None
+
+# CorridorGraphs shared by every Layout with the same walls and kept cells
+CORRIDOR_GRAPH_CACHE = {}
+
+# MoveTables shared by every Layout with the same walls
+MOVE_TABLE_CACHE = {}
+
 
 class Layout:
     """A Layout manages the static information about the game board."""
@@ -34,13 +53,15 @@ class Layout:
         self.width = len(layout_text[0])
         self.height = len(layout_text)
         self.walls = Grid(self.width, self.height, False)
-        self.food = Grid(self.width, self.height, False)
+        self.food = BitGrid(self.width, self.height, False)
         self.capsules = []
         self.agent_positions = []
         self.num_ghosts = 0
         self.process_layout_text(layout_text)
         self.layout_text = layout_text
-        self.total_food = len(self.food.as_list())
+        self.total_food = self.food.count()
+        self.move_table = None
+        self.maze_distances = None
         # self.initialize_visibility_matrix()
 
     def get_num_ghosts(self):
@@ -77,6 +98,47 @@ class Layout:
             self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__,
                                                              self.layout_text)]
 
+    def get_maze_distances(self):
+        """Return the MazeDistances oracle for this layout's walls.
+
+        The table is computed once per distinct set of walls and shared
+        through MAZE_DISTANCE_CACHE (and MAZE_DISTANCE_CACHE_DIR on disk,
+        when set), so deep copies of a layout do not pay for it again.  It
+        is also kept on the layout, so later calls skip the cache lookup.
+        """
+        if self.maze_distances is None:
+            key = str(self.walls)
+            if key not in MAZE_DISTANCE_CACHE:
+                MAZE_DISTANCE_CACHE[key] = MazeDistances(
+                    self.walls, MAZE_DISTANCE_CACHE_DIR)
+            self.maze_distances = MAZE_DISTANCE_CACHE[key]
+        return self.maze_distances
+
+    def get_move_table(self):
+        """Return the MoveTable of this layout's walls.
+
+        The table is built once per distinct set of walls, shared through
+        MOVE_TABLE_CACHE and kept on the layout for direct access.
+        """
+        if self.move_table is None:
+            key = str(self.walls)
+            if key not in MOVE_TABLE_CACHE:
+                MOVE_TABLE_CACHE[key] = MoveTable(self.walls)
+            self.move_table = MOVE_TABLE_CACHE[key]
+        return self.move_table
+
+    def get_corridor_graph(self, keep=()):
+        """Return the CorridorGraph of this layout's walls.
+
+        The cells in keep stay nodes of the graph even inside corridors.
+        Graphs are built once per distinct walls and keep set and shared
+        through CORRIDOR_GRAPH_CACHE.
+        """
+        key = (str(self.walls), frozenset(keep))
+        if key not in CORRIDOR_GRAPH_CACHE:
+            CORRIDOR_GRAPH_CACHE[key] = CorridorGraph(self.walls, keep)
+        return CORRIDOR_GRAPH_CACHE[key]
+
     def is_wall(self, pos):
         """Return whether position is wall or not."""
         x, col = pos
@@ -115,7 +177,12 @@ class Layout:
 
     def deep_copy(self):
         """Create a deep copy of the layout."""
-        return Layout(self.layout_text[:])
+        layout = Layout(self.layout_text[:])
+        # the walls are the same, so the immutable move table and maze
+        # distances can be shared
+        layout.move_table = self.move_table
+        layout.maze_distances = self.maze_distances
+        return layout
 
     def process_layout_text(self, layout_text):
         """Process the layout text.
@@ -159,6 +226,202 @@ class Layout:
             self.num_ghosts += 1
 
 
+class MazeDistances:
+    """Exact maze distances between every pair of open cells of a layout.
+
+    A BFS is run from every open cell and the results are stored in a single
+    array of unsigned shorts, row-major by source cell index, with UNREACHABLE
+    marking pairs that are not connected.
+    """
+
+    UNREACHABLE = 0xFFFF
+
+    def __init__(self, walls, cache_dir=None):
+        """Compute (or load from cache_dir) the distances for given walls."""
+        self.cells = [(x, y) for x in range(walls.width)
+                      for y in range(walls.height) if not walls[x][y]]
+        self.index = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.key = hashlib.sha1(str(walls).encode()).hexdigest()
+
+        self.table = None
+        if cache_dir is not None:
+            self.table = self._load(cache_dir)
+        if self.table is None:
+            self.table = self._compute(walls)
+            if cache_dir is not None:
+                self._save(cache_dir)
+
+    def get_distance(self, point1, point2):
+        """Return the maze distance between two open cells.
+
+        Returns None if the cells are not connected.  Raises KeyError if
+        either point is a wall or outside the layout.
+        """
+        distance = self.table[self.index[point1] * len(self.cells) +
+                              self.index[point2]]
+        if distance == MazeDistances.UNREACHABLE:
+            return None
+        return distance
+
+    def get_distances_from(self, point):
+        """Return a dict mapping every reachable open cell to its distance."""
+        size = len(self.cells)
+        start = self.index[point] * size
+        row = self.table[start:start + size]
+        return dict((cell, distance) for cell, distance in zip(self.cells, row)
+                    if distance != MazeDistances.UNREACHABLE)
+
+    def _compute(self, walls):
+        """Run a BFS from every open cell and return the distance table."""
+        size = len(self.cells)
+        neighbors = []
+        for x, y in self.cells:
+            neighbors.append([self.index[n] for n in
+                              ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y))
+                              if n in self.index])
+
+        table = array('H')
+        for source in range(size):
+            row = [MazeDistances.UNREACHABLE] * size
+            row[source] = 0
+            fringe = deque([source])
+            while fringe:
+                cell = fringe.popleft()
+                next_distance = row[cell] + 1
+                for neighbor in neighbors[cell]:
+                    if row[neighbor] == MazeDistances.UNREACHABLE:
+                        row[neighbor] = next_distance
+                        fringe.append(neighbor)
+            table.extend(row)
+        return table
+
+    def _cache_file(self, cache_dir):
+        """Return the path of the cache file for these walls."""
+        return os.path.join(cache_dir, 'maze-distances-%s.bin' % self.key)
+
+    def _load(self, cache_dir):
+        """Return the table stored in cache_dir or None if missing/invalid."""
+        path = self._cache_file(cache_dir)
+        if not os.path.exists(path):
+            return None
+        table = array('H')
+        with open(path, 'rb') as f:
+            table.frombytes(f.read())
+        if len(table) != len(self.cells) ** 2:
+            return None
+        return table
+
+    def _save(self, cache_dir):
+        """Write the table to cache_dir, ignoring unwritable directories."""
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            with open(self._cache_file(cache_dir), 'wb') as f:
+                self.table.tofile(f)
+        except OSError:
+            pass
+
+
+class MoveTable:
+    """Legal actions and neighbors of every open cell of a layout.
+
+    possible_actions and legal_neighbors map each open (x, y) cell to the
+    tuples Actions.get_possible_actions and Actions.get_legal_neighbors
+    return for it, so that legal-move queries at integer positions are a
+    single dictionary lookup (pass the table as their move_table).
+    """
+
+    def __init__(self, walls):
+        """Tabulate the moves out of every open cell of walls."""
+        self.possible_actions = {}
+        self.legal_neighbors = {}
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if not walls[x][y]:
+                    config = Configuration((x, y), Directions.STOP)
+                    self.possible_actions[(x, y)] = tuple(
+                        Actions.get_possible_actions(config, walls))
+                    self.legal_neighbors[(x, y)] = tuple(
+                        Actions.get_legal_neighbors((x, y), walls))
+
+
+class CorridorGraph:
+    """Maze graph with its corridors collapsed into weighted edges.
+
+    Open cells with exactly two open neighbors only lead on along the
+    corridor, so the nodes of the graph are the other open cells (junctions
+    and dead ends) plus the cells in keep, such as a search problem's start,
+    goals or food.  Each edge follows a corridor from a node to the next
+    node and records the per-step Directions and the cells entered on the
+    way, so searches over the graph can be mapped back to single steps.
+
+    Edges that loop back to their own node and edges into dead ends not in
+    keep are left out, as no shortest path uses them.
+    """
+
+    def __init__(self, walls, keep=()):
+        """Build the graph for given walls, keeping the open cells in keep."""
+        self.keep = set(cell for cell in keep if not walls[cell[0]][cell[1]])
+        self.neighbors = {}
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if not walls[x][y]:
+                    self.neighbors[(x, y)] = [
+                        (direction, (x + dx, y + dy))
+                        for direction, (dx, dy) in (
+                            (Directions.NORTH, (0, 1)),
+                            (Directions.SOUTH, (0, -1)),
+                            (Directions.EAST, (1, 0)),
+                            (Directions.WEST, (-1, 0)))
+                        if not walls[x + dx][y + dy]]
+
+        self.nodes = set(cell for cell in self.neighbors
+                         if len(self.neighbors[cell]) != 2
+                         or cell in self.keep)
+        self.edges = dict((node, self._follow_corridors(node))
+                          for node in self.nodes)
+
+    def _follow_corridors(self, node):
+        """Return the (end, actions, cells) edges leaving node."""
+        edges = []
+        for direction, cell in self.neighbors[node]:
+            previous = node
+            actions, cells = [direction], [cell]
+            while cell not in self.nodes:
+                for step, following in self.neighbors[cell]:
+                    if following != previous:
+                        break
+                previous, cell = cell, following
+                actions.append(step)
+                cells.append(cell)
+            if cell == node:
+                continue
+            if len(self.neighbors[cell]) == 1 and cell not in self.keep:
+                continue
+            edges.append((cell, tuple(actions), tuple(cells)))
+        return edges
+
+    def get_edges(self, node):
+        """Return the (end, actions, cells) edges leaving node.
+
+        actions are the Directions leading from node to end and cells are
+        the cells entered on the way, ending with end.
+        """
+        return self.edges[node]
+
+    def is_node(self, cell):
+        """Return True iff cell is a node of the graph."""
+        return cell in self.nodes
+
+    def get_average_edge_length(self):
+        """Return the average number of steps along an edge."""
+        lengths = [len(actions) for edges in self.edges.values()
+                   for _, actions, _ in edges]
+        if not lengths:
+            return 0.0
+        return sum(lengths) / float(len(lengths))
+
+
 def get_layout(name, back=2):
     """Retrieve a given layout."""
     if name.endswith('.lay'):
@@ -47,12 +47,22 @@ from game import GameStateData
 from game import Game
 from game import Directions
 from game import Actions
+from game import Configuration
 from util import nearest_point
 from util import manhattan_distance
 import layout
 import sys
 import random
 import os
+import time
+
+# Modes for the GameState.explored bookkeeping (see set_explored_tracking)
+EXPLORED_FULL = 'full'
+EXPLORED_BOUNDED = 'bounded'
+EXPLORED_COUNT = 'count'
+EXPLORED_OFF = 'off'
+EXPLORED_MODES = [EXPLORED_FULL, EXPLORED_BOUNDED, EXPLORED_COUNT,
+                  EXPLORED_OFF]
 
 
 ###################################################
@@ -83,13 +93,83 @@ class GameState:
     # called
     explored = set()
 
+    # how generate_successor maintains explored; see set_explored_tracking.
+    # Only counting by default, so long runs do not keep every state alive;
+    # code that reads explored must switch to full (or bounded) tracking
+    explored_mode = EXPLORED_COUNT
+    explored_limit = None
+    explored_sample = 1
+    explored_calls = 0
+    explored_hash_time = 0.0
+
     @staticmethod
     def get_and_reset_explored():
         """Return a copy of the explored set and reset the original."""
         tmp = GameState.explored.copy()
         GameState.explored = set()
+        GameState.explored_calls = 0
+        GameState.explored_hash_time = 0.0
         return tmp
 
+    @staticmethod
+    def set_explored_tracking(mode=EXPLORED_COUNT, limit=None, sample=1):
+        """Choose how generate_successor records states in explored.
+
+        Args:
+            mode: one of
+                EXPLORED_FULL: add every parent and child state
+                EXPLORED_BOUNDED: like full, but stop growing the set once it
+                                  holds limit states and only record every
+                                  sample-th call
+                EXPLORED_COUNT: only count generate_successor calls, so no
+                                state is ever hashed or kept alive (default)
+                EXPLORED_OFF: do no bookkeeping at all
+            limit: maximum size of the explored set in bounded mode
+            sample: record every sample-th call in bounded mode
+        """
+        if mode not in EXPLORED_MODES:
+            raise ValueError('Unknown explored tracking mode: ' + str(mode))
+        GameState.explored_mode = mode
+        GameState.explored_limit = limit
+        GameState.explored_sample = max(1, int(sample))
+        GameState.get_and_reset_explored()
+
+    @staticmethod
+    def get_explored_stats():
+        """Return a dict describing the cost of the explored bookkeeping.
+
+        Keys are the tracking mode, the number of generate_successor calls
+        seen, the number of states in the explored set, the bytes taken by
+        the set's hash table (not counting the states themselves) and the
+        seconds spent hashing states into it.
+        """
+        return {'mode': GameState.explored_mode,
+                'calls': GameState.explored_calls,
+                'size': len(GameState.explored),
+                'table_bytes': sys.getsizeof(GameState.explored),
+                'hash_time': GameState.explored_hash_time}
+
+    @staticmethod
+    def _record_explored(parent, child):
+        """Record a generate_successor call according to explored_mode."""
+        mode = GameState.explored_mode
+        if mode == EXPLORED_OFF:
+            return
+        GameState.explored_calls += 1
+        if mode == EXPLORED_COUNT:
+            return
+        explored = GameState.explored
+        if mode == EXPLORED_BOUNDED:
+            if GameState.explored_calls % GameState.explored_sample != 0:
+                return
+            limit = GameState.explored_limit
+            if limit is not None and len(explored) >= limit:
+                return
+        start_time = time.perf_counter()
+        explored.add(parent)
+        explored.add(child)
+        GameState.explored_hash_time += time.perf_counter() - start_time
+
     def get_legal_actions(self, agent_index=0):
         """Return the legal actions for the agent specified."""
         if self.is_win() or self.is_lose():
@@ -121,7 +201,8 @@ class GameState:
             # Penalty for waiting around
             state.data.score_change += -TIME_PENALTY
         else:
-            GhostRules.decrement_timer(state.data.agent_states[agent_index])
+            GhostRules.decrement_timer(
+                state.data.get_mutable_agent_state(agent_index))
 
         # Resolve multi-agent effects
         GhostRules.check_death(state, agent_index)
@@ -129,8 +210,8 @@ class GameState:
         # Book keeping
         state.data._agent_moved = agent_index
         state.data.score += state.data.score_change
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        state.data.freeze()
+        GameState._record_explored(self, state)
         return state
 
     def get_legal_pacman_actions(self):
@@ -198,7 +279,17 @@ class GameState:
 
     def get_num_food(self):
         """Return number of food pellets in the game state."""
-        return self.data.food.count()
+        return self.data.num_food
+
+    def get_food_positions(self):
+        """Return a frozenset of the (x, y) positions of the food.
+
+        Built from the food grid the first time it is asked for, then kept
+        up to date as pellets are eaten and shared with successor states.
+        """
+        if self.data.food_positions is None:
+            self.data.food_positions = frozenset(self.data.food.as_list())
+        return self.data.food_positions
 
     def get_food(self):
         """Return a Grid of boolean food indicator variables.
@@ -222,6 +313,21 @@ class GameState:
         """
         return self.data.layout.walls
 
+    def get_maze_distances(self):
+        """Return the layout.MazeDistances oracle for this state's layout.
+
+        maze_distances.get_distance((x1, y1), (x2, y2)) gives the exact
+        number of steps between two open cells, ignoring agents.
+        """
+        return self.data.layout.get_maze_distances()
+
+    def get_corridor_graph(self, keep=()):
+        """Return the layout.CorridorGraph for this state's layout.
+
+        The cells in keep stay nodes of the graph even inside corridors.
+        """
+        return self.data.layout.get_corridor_graph(keep)
+
     def has_food(self, x, y):
         """Return whether there is food at (x,y)."""
         return self.data.food[x][y]
@@ -370,8 +476,10 @@ class PacmanRules:
     @staticmethod
     def get_legal_actions(state):
         """Return a list of possible actions."""
+        layout = state.data.layout
         return Actions.get_possible_actions(
-            state.get_pacman_state().configuration, state.data.layout.walls)
+            state.get_pacman_state().configuration, layout.walls,
+            layout.get_move_table())
 
     @staticmethod
     def apply_action(state, action):
@@ -383,7 +491,7 @@ class PacmanRules:
         if action not in legal:
             raise IllegalActionError("Illegal action " + str(action))
 
-        pacman_state = state.data.agent_states[0]
+        pacman_state = state.data.get_mutable_agent_state(0)
 
         # Update Configuration
         vector = Actions.direction_to_vector(action, PacmanRules.PACMAN_SPEED)
@@ -407,18 +515,23 @@ class PacmanRules:
             state.data.food = state.data.food.copy()
             state.data.food[x][y] = False
             state.data._food_eaten = position
-            # TODO: cache num_food?
-            num_food = state.get_num_food()
-            if num_food == 0 and not state.data._lose:
+            state.data.num_food -= 1
+            if state.data.food_positions is not None:
+                state.data.food_positions = \
+                    state.data.food_positions - frozenset([position])
+            if state.data.num_food == 0 and not state.data._lose:
                 state.data.score_change += 500
                 state.data._win = True
         # Eat capsule
         if(position in state.get_capsules()):
-            state.data.capsules.remove(position)
+            # the capsule list may be shared with other states
+            state.data.capsules = [capsule for capsule in state.data.capsules
+                                   if capsule != position]
             state.data._capsule_eaten = position
             # Reset all ghosts' scared timers
             for index in range(1, len(state.data.agent_states)):
-                state.data.agent_states[index].scared_timer = SCARED_TIME
+                state.data.get_mutable_agent_state(index).scared_timer = \
+                    SCARED_TIME
 
 
 class GhostRules:
@@ -434,8 +547,9 @@ class GhostRules:
         dead end, but can turn 90 degrees at intersections.
         """
         conf = state.get_ghost_state(ghost_index).configuration
+        layout = state.data.layout
         possible_actions = Actions.get_possible_actions(
-            conf, state.data.layout.walls)
+            conf, layout.walls, layout.get_move_table())
         reverse = Actions.reverse_direction(conf.direction)
         if Directions.STOP in possible_actions:
             possible_actions.remove(Directions.STOP)
@@ -453,7 +567,7 @@ class GhostRules:
         if action not in legal:
             raise IllegalActionError("Illegal ghost action " + str(action))
 
-        ghost_state = state.data.agent_states[ghost_index]
+        ghost_state = state.data.get_mutable_agent_state(ghost_index)
         speed = GhostRules.GHOST_SPEED
         if ghost_state.scared_timer > 0:
             speed /= 2.0
@@ -466,8 +580,10 @@ class GhostRules:
         """Decrement ghost's scared timer."""
         timer = ghost_state.scared_timer
         if timer == 1:
-            ghost_state.configuration.position = nearest_point(
-                ghost_state.configuration.position)
+            # configurations are shared between states, so replace it
+            ghost_state.configuration = Configuration(
+                nearest_point(ghost_state.configuration.position),
+                ghost_state.configuration.direction)
         ghost_state.scared_timer = max(0, timer - 1)
 
     @staticmethod
@@ -479,12 +595,16 @@ class GhostRules:
                 ghost_state = state.data.agent_states[index]
                 ghost_position = ghost_state.configuration.get_position()
                 if GhostRules.can_kill(pacman_position, ghost_position):
-                    GhostRules.collide(state, ghost_state, index)
+                    GhostRules.collide(
+                        state, state.data.get_mutable_agent_state(index),
+                        index)
         else:
             ghost_state = state.data.agent_states[agent_index]
             ghost_position = ghost_state.configuration.get_position()
             if GhostRules.can_kill(pacman_position, ghost_position):
-                GhostRules.collide(state, ghost_state, agent_index)
+                GhostRules.collide(
+                    state, state.data.get_mutable_agent_state(agent_index),
+                    agent_index)
 
     @staticmethod
     def collide(state, ghost_state, agent_index):
@@ -493,7 +613,8 @@ class GhostRules:
             state.data.score_change += 200
             GhostRules.place_ghost(state, ghost_state)
             ghost_state.scared_timer = 0
-            # Added for first-person
+            # Added for first-person; the list may be shared with other states
+            state.data._eaten = state.data._eaten[:]
             state.data._eaten[agent_index] = True
         else:
             if not state.data._win:
@@ -607,6 +728,28 @@ def read_command(argv):
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend'
                                    'computing in a single game'), default=30)
+    parser.add_option('-w', '--workers', dest='workers', type='int',
+                      help=default('Number of processes to spread the games'
+                                   ' over; more than 1 disables graphics'),
+                      default=1)
+    parser.add_option('--distance_cache', dest='distance_cache',
+                      help='Directory caching maze distance tables between'
+                           ' runs', default=None)
+    parser.add_option('--explored', dest='explored', type='choice',
+                      choices=EXPLORED_MODES,
+                      help='How GameState.explored records generated states:'
+                           ' %s. Prints its overhead after the games'
+                           ' [Default: count, without the report]' %
+                           ', '.join(EXPLORED_MODES),
+                      default=None)
+    parser.add_option('--explored_limit', dest='explored_limit', type='int',
+                      help=default('Maximum size of the explored set in'
+                                   ' bounded mode, per game with -w'),
+                      default=100000)
+    parser.add_option('--explored_sample', dest='explored_sample',
+                      type='int',
+                      help=default('Record every Nth generated state in'
+                                   ' bounded mode'), default=1)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -618,6 +761,8 @@ def read_command(argv):
         random.seed('cs188')
 
     # Choose a layout
+    if options.distance_cache is not None:
+        layout.MAZE_DISTANCE_CACHE_DIR = options.distance_cache
     args['layout'] = layout.get_layout(options.layout)
     if args['layout'] is None:
         raise Exception("The layout " + options.layout + " cannot be found")
@@ -659,13 +804,18 @@ def read_command(argv):
     args['record'] = options.record
     args['catch_exceptions'] = options.catch_exceptions
     args['timeout'] = options.timeout
+    args['workers'] = options.workers
+    if options.explored is not None:
+        args['explored'] = options.explored
+        args['explored_limit'] = options.explored_limit
+        args['explored_sample'] = options.explored_sample
 
     # Special case: recorded games don't use the run_games method or
     # args structure
     if options.game_to_replay is not None:
         print('Replaying recorded game %s.' % options.game_to_replay)
         import pickle
-        f = open(options.game_to_replay)
+        f = open(options.game_to_replay, 'rb')
         try:
             recorded = pickle.load(f)
         finally:
@@ -731,40 +881,157 @@ def replay_game(layout, actions, display):
     display.finish()
 
 
+class GameRecord:
+    """Outcome of a game played by a worker process (see run_games).
+
+    Holds the parts of a game.Game the batch summary and recorder use, since
+    the Game itself (with its agents and output buffers) cannot be sent back
+    from the worker.
+    """
+
+    def __init__(self, game, seed, explored_stats):
+        """Copy the outcome of the given finished game."""
+        self.state = game.state
+        self.move_history = game.move_history
+        self.agent_crashed = game.agent_crashed
+        self.agent_timeout = game.agent_timeout
+        self.seed = seed
+        self.explored_stats = explored_stats
+
+
+# Game components shared with the worker processes of run_games
+_WORKER_GAME_ARGS = None
+
+
+def _init_game_worker(game_args, explored_args):
+    """Store the game components in a run_games worker process."""
+    global _WORKER_GAME_ARGS
+    _WORKER_GAME_ARGS = game_args
+    if explored_args is not None:
+        GameState.set_explored_tracking(*explored_args)
+
+
+def _play_game_in_worker(task):
+    """Play one game in a worker process and return its GameRecord."""
+    import text_display
+    index, seed = task
+    layout, pacman, ghosts, catch_exceptions, timeout = _WORKER_GAME_ARGS
+    random.seed(seed)
+    GameState.get_and_reset_explored()
+
+    rules = ClassicGameRules(timeout)
+    rules.quiet = False
+    game = rules.new_game(layout, pacman, ghosts, text_display.NullGraphics(),
+                          False, catch_exceptions)
+    game.run()
+    return GameRecord(game, seed, GameState.get_explored_stats())
+
+
+def _run_games_in_workers(layout, pacman, ghosts, num_games, catch_exceptions,
+                          timeout, workers, explored_args, base_seed):
+    """Play num_games games across a pool of worker processes.
+
+    Game i is seeded with game_seed(base_seed, i), as in the serial loop of
+    run_games, so a batch replays identically no matter how many workers
+    play it.
+
+    Returns the GameRecords in game order.
+    """
+    import multiprocessing
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # forked workers inherit the agents, which may not be picklable
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+
+    tasks = [(i, game_seed(base_seed, i)) for i in range(num_games)]
+    game_args = (layout, pacman, ghosts, catch_exceptions, timeout)
+    with context.Pool(workers, _init_game_worker,
+                      (game_args, explored_args)) as pool:
+        return pool.map(_play_game_in_worker, tasks, chunksize=1)
+
+
+def game_seed(base_seed, index):
+    """Return the random seed of game index in a batch run by run_games."""
+    return '%d-%d' % (base_seed, index)
+
+
+def _record_game(index, layout, move_history):
+    """Write a game's move history to a file named by the current time."""
+    import pickle
+    fname = ('recorded-game-%d' % (index + 1)) + '-'.join(
+        [str(t) for t in time.localtime()[1:6]])
+    f = open(fname, 'wb')
+    components = {'layout': layout, 'actions': move_history}
+    pickle.dump(components, f)
+    f.close()
+
+
 def run_games(layout, pacman, ghosts, display, num_games, record,
-              num_training=0, catch_exceptions=False, timeout=30):
-    """Run the games; main execution loop when called from command line."""
+              num_training=0, catch_exceptions=False, timeout=30,
+              explored=None, explored_limit=None, explored_sample=1,
+              workers=1):
+    """Run the games; main execution loop when called from command line.
+
+    If explored is given, GameState.explored is tracked in that mode (see
+    GameState.set_explored_tracking) and its overhead is printed at the end.
+    With workers, every game keeps its own explored set, so a bounded limit
+    applies to each game and the reported sizes are summed over the games.
+
+    Every non-training game is seeded with a seed derived from its index
+    and a base seed drawn from the random module (see game_seed), so a batch
+    (after random.seed, e.g. with -f) plays the same games whatever the
+    number of workers.
+
+    If workers is more than 1 the games are spread over that many processes
+    without graphics, and GameRecords are returned in place of the
+    game.Game objects.  Training games always run in this process, since
+    learning agents carry state from one game to the next.
+    """
     import __main__
     __main__.__dict__['_display'] = display
 
+    explored_args = None
+    if explored is not None:
+        explored_args = (explored, explored_limit, explored_sample)
+        GameState.set_explored_tracking(*explored_args)
+
     rules = ClassicGameRules(timeout)
     games = []
+    base_seed = random.randrange(2 ** 32)
 
-    for i in range(num_games):
-        be_quiet = i < num_training
-        if be_quiet:
-            # Suppress output and graphics
-            import text_display
-            game_display = text_display.NullGraphics()
-            rules.quiet = True
-        else:
-            game_display = display
-            rules.quiet = False
-        game = rules.new_game(layout, pacman, ghosts, game_display, be_quiet,
-                              catch_exceptions)
-        game.run()
-        if not be_quiet:
-            games.append(game)
+    if workers > 1 and num_training > 0:
+        print('Training games cannot be played in parallel; '
+              'running all games in one process.')
+        workers = 1
 
+    if workers > 1:
+        games = _run_games_in_workers(layout, pacman, ghosts, num_games,
+                                      catch_exceptions, timeout, workers,
+                                      explored_args, base_seed)
         if record:
-            import time
-            import pickle
-            fname = ('recorded-game-%d' % (i + 1)) + '-'.join(
-                [str(t) for t in time.localtime()[1:6]])
-            f = open(fname, 'w')
-            components = {'layout': layout, 'actions': game.move_history}
-            pickle.dump(components, f)
-            f.close()
+            for i, game in enumerate(games):
+                _record_game(i, layout, game.move_history)
+    else:
+        for i in range(num_games):
+            be_quiet = i < num_training
+            if be_quiet:
+                # Suppress output and graphics
+                import text_display
+                game_display = text_display.NullGraphics()
+                rules.quiet = True
+            else:
+                game_display = display
+                rules.quiet = False
+                random.seed(game_seed(base_seed, i))
+            game = rules.new_game(layout, pacman, ghosts, game_display,
+                                  be_quiet, catch_exceptions)
+            game.run()
+            if not be_quiet:
+                games.append(game)
+
+            if record:
+                _record_game(i, layout, game.move_history)
 
     if (num_games - num_training) > 0:
         scores = [game.state.get_score() for game in games]
@@ -777,6 +1044,24 @@ def run_games(layout, pacman, ghosts, display, num_games, record,
         print('Record:       ', ', '.join([['Loss', 'Win'][int(w)]
                                            for w in wins]))
 
+    if explored is not None:
+        if workers > 1:
+            per_game = [game.explored_stats for game in games]
+            stats = {'mode': explored,
+                     'calls': sum(s['calls'] for s in per_game),
+                     'size': sum(s['size'] for s in per_game),
+                     'table_bytes': sum(s['table_bytes'] for s in per_game),
+                     'hash_time': sum(s['hash_time'] for s in per_game)}
+        else:
+            stats = GameState.get_explored_stats()
+        print('Explored:      mode %s, %d successors generated, %d states '
+              'kept (%.1f KB table), %.3fs hashing' %
+              (stats['mode'], stats['calls'], stats['size'],
+               stats['table_bytes'] / 1024.0, stats['hash_time']))
+        if workers > 1:
+            print('               (summed over the games, each with its own '
+                  'explored set)')
+
     return games
 
 
@@ -0,0 +1,114 @@
+"""Micro-benchmark for the priority queues in util.py.
+
+Compares util.PriorityQueue with util.IndexedPriorityQueue on plain
+push/pop traffic and on reprioritization-heavy traffic, and
+util.PriorityQueueWithFunction on the duplicate-pushing traffic of
+search.graph_search.
+
+Usage:
+    python priority_queue_benchmark.py [-n SIZE] [-r REPEATS]
+"""
+
+import random
+import sys
+import time
+
+import util
+
+
+def make_workload(size, seed=0):
+    """Return (pushes, updates) for a queue of given size.
+
+    pushes is a list of (key, priority) pairs; updates is a list of
+    (key, priority) pairs that mostly lower the priority of a pushed key.
+    """
+    rng = random.Random(seed)
+    pushes = [(key, rng.randint(size, 10 * size)) for key in range(size)]
+    updates = [(rng.randrange(size), rng.randint(0, 10 * size))
+               for _ in range(size)]
+    return pushes, updates
+
+
+def push_pop(queue, pushes):
+    """Push every key and pop the queue empty."""
+    for key, priority in pushes:
+        queue.push(key, priority)
+    while not queue.is_empty():
+        queue.pop()
+
+
+def update_pop(queue, pushes, updates):
+    """Push every key, reprioritize with update, then pop the queue empty."""
+    for key, priority in pushes:
+        queue.push(key, priority)
+    for key, priority in updates:
+        queue.update(key, priority)
+    while not queue.is_empty():
+        queue.pop()
+
+
+def function_push_pop(queue, pushes, updates):
+    """Push (key, priority) items, duplicates included, and pop them all."""
+    for item in pushes:
+        queue.push(item)
+    for item in updates:
+        queue.push(item)
+    while not queue.is_empty():
+        queue.pop()
+
+
+def best_time(function, repeats):
+    """Return the fastest of repeats timed calls of function."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_benchmark(size=2000, repeats=5):
+    """Run all benchmarks and return a list of (name, seconds) rows."""
+    pushes, updates = make_workload(size)
+
+    def priority(item):
+        return item[1]
+
+    cases = [
+        ('push/pop        PriorityQueue',
+         lambda: push_pop(util.PriorityQueue(), pushes)),
+        ('push/pop        IndexedPriorityQueue',
+         lambda: push_pop(util.IndexedPriorityQueue(), pushes)),
+        ('update/pop      PriorityQueue',
+         lambda: update_pop(util.PriorityQueue(), pushes, updates)),
+        ('update/pop      IndexedPriorityQueue',
+         lambda: update_pop(util.IndexedPriorityQueue(), pushes, updates)),
+        ('with function   PriorityQueueWithFunction',
+         lambda: function_push_pop(
+             util.PriorityQueueWithFunction(priority), pushes, updates)),
+    ]
+    return [(name, best_time(function, repeats)) for name, function in cases]
+
+
+def main(argv):
+    """Parse arguments, run the benchmark and print a table."""
+    from optparse import OptionParser
+    parser = OptionParser('python priority_queue_benchmark.py [options]')
+    parser.add_option('-n', '--size', dest='size', type='int', default=2000,
+                      help='number of keys pushed [Default: %default]')
+    parser.add_option('-r', '--repeats', dest='repeats', type='int',
+                      default=5,
+                      help='timed runs per case, best is kept '
+                           '[Default: %default]')
+    options, _ = parser.parse_args(argv)
+
+    print('%d keys, %d updates, best of %d' %
+          (options.size, options.size, options.repeats))
+    for name, seconds in run_benchmark(options.size, options.repeats):
+        print('%-50s %9.2f ms' % (name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
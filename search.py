@@ -33,8 +33,8 @@ Student side autograding was added by Brad Miller, Nick Hay, and
 Pieter Abbeel (pabbeel@cs.berkeley.edu).
 """
 
+import time
 import util
-import copy
 
 
 class SearchProblem:
@@ -88,55 +88,305 @@ def tiny_maze_search(problem):
     return [s, s, w, s, w, w, s, w]
 
 
+class NodeTable:
+    """Parent-pointer store for the nodes expanded by graph_search.
+
+    Every expanded node is recorded once as the action that reached it and the
+    index of its parent, so fringe entries only need to remember the index of
+    the node they were generated from instead of carrying a copy of the whole
+    path.
+    """
+
+    def __init__(self):
+        """Create a table holding only the root (start) node at index 0."""
+        self.actions = [None]
+        self.parents = [None]
+
+    def add(self, action, parent):
+        """Record an expanded node and return its index."""
+        self.actions.append(action)
+        self.parents.append(parent)
+        return len(self.actions) - 1
+
+    def get_actions(self, index):
+        """Return the list of actions leading from the root to index."""
+        actions = []
+        while index:
+            actions.append(self.actions[index])
+            index = self.parents[index]
+        actions.reverse()
+        return actions
+
+    def get_path(self, entry):
+        """Return the list of actions leading to the given fringe entry."""
+        return self.get_actions(entry[2]) + [entry[1]]
+
+
+# SearchStats filled in by the running instrumented search (see
+# run_with_stats); None, the default, leaves the searches untouched
+SEARCH_STATS = None
+
+
+class SearchStats:
+    """Counters and timers collected while a search runs.
+
+    Filled in by run_with_stats:
+
+    - generated: successors returned by get_successors
+    - expanded: calls to get_successors
+    - duplicates: fringe pushes of states that had been pushed before
+    - peak_fringe: largest fringe size
+    - peak_closed: largest closed set size
+    - heuristic_calls: calls to the heuristic
+    - successor_time, heuristic_time, queue_time: seconds spent in
+      get_successors, the heuristic and fringe operations
+    - wall_time: seconds for the whole search
+
+    The fringe and closed set figures are only known for searches built on
+    graph_search; other searches that record their peak fringe as
+    problem._peak_fringe report it too.  Searches that never call the
+    problem's get_successors, like jump_point_search, expand nothing here.
+    """
+
+    FIELDS = ['generated', 'expanded', 'duplicates', 'peak_fringe',
+              'peak_closed', 'heuristic_calls', 'successor_time',
+              'heuristic_time', 'queue_time', 'wall_time']
+
+    def __init__(self):
+        """Create stats with every counter and timer at zero."""
+        for field in SearchStats.FIELDS:
+            setattr(self, field, 0)
+        self.closed_sets = []
+
+    def as_dict(self):
+        """Return the counters and timers as a dict."""
+        return dict((field, getattr(self, field))
+                    for field in SearchStats.FIELDS)
+
+    def __str__(self):
+        """Return the stats as one 'name: value' line per field."""
+        lines = []
+        for field in SearchStats.FIELDS:
+            value = getattr(self, field)
+            if field.endswith('_time'):
+                lines.append('%s: %.4fs' % (field, value))
+            else:
+                lines.append('%s: %d' % (field, value))
+        return '\n'.join(lines)
+
+
+class InstrumentedProblem(SearchProblem):
+    """View of a search problem that times and counts get_successors.
+
+    get_predecessors, if the wrapped problem has it, is timed and counted
+    the same way.  Any other attribute is read from and written to the
+    wrapped problem, so bookkeeping such as _expanded stays on it.
+    """
+
+    def __init__(self, problem, stats):
+        """Wrap problem, recording into the SearchStats stats."""
+        object.__setattr__(self, 'problem', problem)
+        object.__setattr__(self, 'stats', stats)
+
+    def __getattr__(self, name):
+        """Read attributes not set here from the wrapped problem."""
+        if name == 'get_predecessors':
+            return self._timed(self.problem.get_predecessors)
+        return getattr(self.problem, name)
+
+    def __setattr__(self, name, value):
+        """Set attributes on the wrapped problem."""
+        setattr(self.problem, name, value)
+
+    def __dir__(self):
+        """List the attributes of the view and of the wrapped problem."""
+        return sorted(set(object.__dir__(self)) | set(dir(self.problem)))
+
+    def get_start_state(self):
+        """Return the wrapped problem's start state."""
+        return self.problem.get_start_state()
+
+    def is_goal_state(self, state):
+        """Return the wrapped problem's goal test of state."""
+        return self.problem.is_goal_state(state)
+
+    def get_successors(self, state):
+        """Return the wrapped problem's successors, timing the call."""
+        return self._timed(self.problem.get_successors)(state)
+
+    def _timed(self, get_successors):
+        """Return get_successors wrapped to record into the stats."""
+        stats = self.stats
+
+        def timed(state):
+            start = time.perf_counter()
+            successors = get_successors(state)
+            stats.successor_time += time.perf_counter() - start
+            stats.expanded += 1
+            stats.generated += len(successors)
+            return successors
+        return timed
+
+    def get_cost_of_actions(self, actions):
+        """Return the wrapped problem's cost of actions."""
+        return self.problem.get_cost_of_actions(actions)
+
+
+class InstrumentedFringe:
+    """View of a graph_search fringe that times and counts its operations.
+
+    Also tracks the peak fringe size and counts pushes of entries whose
+    state (see fringe_key) has been pushed before.
+    """
+
+    def __init__(self, fringe, stats):
+        """Wrap fringe, recording into the SearchStats stats."""
+        self.fringe = fringe
+        self.stats = stats
+        self.pushed = set()
+
+    def push(self, entry):
+        """Push entry onto the wrapped fringe."""
+        state = fringe_key(entry)
+        if state in self.pushed:
+            self.stats.duplicates += 1
+        else:
+            self.pushed.add(state)
+        # priority functions may call the heuristic, which is timed apart
+        heuristic_time = self.stats.heuristic_time
+        start = time.perf_counter()
+        self.fringe.push(entry)
+        self.stats.queue_time += (time.perf_counter() - start -
+                                  (self.stats.heuristic_time - heuristic_time))
+        self.stats.peak_fringe = max(self.stats.peak_fringe, len(self.fringe))
+
+    def pop(self):
+        """Pop the next entry from the wrapped fringe."""
+        start = time.perf_counter()
+        entry = self.fringe.pop()
+        self.stats.queue_time += time.perf_counter() - start
+        return entry
+
+    def is_empty(self):
+        """Return true iff the wrapped fringe is empty."""
+        return self.fringe.is_empty()
+
+
+def run_with_stats(search_function, problem, heuristic=None, stats=None):
+    """Run search_function on problem and return (actions, stats).
+
+    The search is run on an InstrumentedProblem view of problem and, if
+    heuristic is given, with a timed version of it passed as the heuristic
+    keyword argument.  Searches built on graph_search also get an
+    InstrumentedFringe.  Results are added to stats, a new SearchStats if
+    none is given.  Searches run without this function are not slowed
+    down: graph_search only checks SEARCH_STATS once per search.
+    """
+    global SEARCH_STATS
+    if stats is None:
+        stats = SearchStats()
+    instrumented = InstrumentedProblem(problem, stats)
+
+    def timed_heuristic(state, search_problem=None):
+        """Call heuristic with the uninstrumented problem, timing it."""
+        if search_problem is instrumented:
+            search_problem = problem
+        start = time.perf_counter()
+        value = heuristic(state, search_problem)
+        stats.heuristic_time += time.perf_counter() - start
+        stats.heuristic_calls += 1
+        return value
+
+    outer_stats = SEARCH_STATS
+    SEARCH_STATS = stats
+    start = time.perf_counter()
+    try:
+        if heuristic is None:
+            actions = search_function(instrumented)
+        else:
+            actions = search_function(instrumented, heuristic=timed_heuristic)
+    finally:
+        stats.wall_time += time.perf_counter() - start
+        SEARCH_STATS = outer_stats
+
+    # closed sets only grow, so their final sizes are their peaks
+    for closed in stats.closed_sets:
+        stats.peak_closed = max(stats.peak_closed, len(closed))
+    stats.closed_sets = []
+    if '_peak_fringe' in dir(problem):
+        stats.peak_fringe = max(stats.peak_fringe, problem._peak_fringe)
+    return actions, stats
+
+
 def graph_search(problem, fringe):
-    """Return a sequence of moves to solve a maze."""
+    """Return a sequence of moves to solve a maze.
+
+    Fringe entries are (state, action, parent, cost) tuples, where parent is
+    the index in the NodeTable of the node the entry was generated from and
+    cost is the accumulated cost of the path to state, built up from the
+    step costs returned by get_successors.
+
+    Args:
+        problem: the search problem to solve
+        fringe: a Stack, Queue or PriorityQueueWithFunction of entries
+
+    A state may be on the fringe more than once; entries whose state has
+    already been expanded are skipped when they are popped.
+
+    Inside run_with_stats the fringe is wrapped in an InstrumentedFringe and
+    the closed set is handed to the SearchStats.
+    """
+    nodes = NodeTable()
     closed = set()
 
+    if SEARCH_STATS is not None:
+        fringe = InstrumentedFringe(fringe, SEARCH_STATS)
+        SEARCH_STATS.closed_sets.append(closed)
+
     closed.add(problem.get_start_state())
 
     # we know that we aren't starting at the goal,
     # so we start by putting the successors of the start state
-    # on the fringe
-    for state in problem.get_successors(problem.get_start_state()):
-        # the nodes are being placed in an array as the fringe
-        # is keeping track of the path, not just the individual nodes
-        # it just so happens that this is a path with only one step
-        fringe.push([state])
+    # on the fringe, all pointing back at the root node
+    for state, action, step_cost in problem.get_successors(
+            problem.get_start_state()):
+        fringe.push((state, action, 0, step_cost))
 
     while not fringe.is_empty():
 
-        # grab the next path to explore on the fringe
-        path = fringe.pop()
+        # grab the next entry to explore on the fringe
+        entry = fringe.pop()
+        state = entry[0]
 
-        # the last element in the path is the newest node
-        # and we need to check it's state
-        state = path[-1][0]
-
-        # should we be adding the whole path here?
         if state not in closed:
             closed.add(state)
 
             if problem.is_goal_state(state):
-                # we only need the directions we are going
-                # so we are just returning that part of our path
-                return [state[1] for state in path]
+                # the path is only rebuilt once, when we reach the goal
+                return nodes.get_path(entry)
+
+            # the entry is being expanded, so it becomes a node that
+            # its successors can point back to
+            index = nodes.add(entry[1], entry[2])
 
             # while we are already iterating over the new nodes
             # we should make sure that we haven't explored any
             # of them already
-            successors = [node for node in problem.get_successors(state)
-                          if node[0] not in closed]
+            cost = entry[3]
+            for state, action, step_cost in problem.get_successors(state):
+                if state not in closed:
+                    fringe.push((state, action, index, cost + step_cost))
 
-            for node in successors:
-                # create a new path based off of what we have just explored
-                tmp_path = copy.deepcopy(path)
+    return None
 
-                # add the new node to explore to the end of said path
-                tmp_path.append(node)
 
-                fringe.push(tmp_path)
+def fringe_key(entry):
+    """Return the state of a fringe entry.
 
-    return None
+    InstrumentedFringe counts an entry as a duplicate if an entry with the
+    same state has been pushed before.
+    """
+    return entry[0]
 
 
 def depth_first_search(problem):
@@ -164,8 +414,8 @@ def breadth_first_search(problem):
 
 def uniform_cost_search(problem):
     """Run UCS on the given problem."""
-    def calc_cost(path):
-        return problem.get_cost_of_actions([node[1] for node in path])
+    def calc_cost(entry):
+        return entry[3]
 
     return graph_search(problem, util.PriorityQueueWithFunction(calc_cost))
 
@@ -184,15 +434,506 @@ def a_star_search(problem, heuristic=null_heuristic):
 
     A* searches the node that has the lowest combined cost and heuristic first.
     """
-    def calc_cost(path):
-        return problem.get_cost_of_actions([node[1] for node in path]) + \
-            heuristic(path[-1][0], problem)
+    def calc_cost(entry):
+        return entry[3] + heuristic(entry[0], problem)
 
     return graph_search(problem, util.PriorityQueueWithFunction(calc_cost))
 
 
+def cost_bounded_search(problem, heuristic, bound):
+    """Run one depth-first iteration of IDA* below the given f-cost bound.
+
+    Only the current path is kept in memory, as a stack of the states on it
+    together with iterators over their not yet tried successors.  States
+    already on the current path are skipped so the search cannot loop.
+
+    Returns (actions, next_bound, peak) where actions is the list of actions
+    to a goal (None if no goal was found below bound), next_bound is the
+    smallest f-cost that exceeded bound and peak is the largest number of
+    generated but untried successors held at once.
+    """
+    start = problem.get_start_state()
+    if problem.is_goal_state(start):
+        return [], bound, 0
+
+    next_bound = float('inf')
+    actions = []
+    on_path = set([start])
+    successors = problem.get_successors(start)
+    stack = [(start, 0, iter(successors))]
+    fringe_size = peak = len(successors)
+
+    while stack:
+        state, cost, successors = stack[-1]
+        successor = next(successors, None)
+        if successor is None:
+            # every successor of state was tried, so backtrack
+            stack.pop()
+            on_path.discard(state)
+            if actions:
+                actions.pop()
+            continue
+
+        fringe_size -= 1
+        next_state, action, step_cost = successor
+        if next_state in on_path:
+            continue
+
+        g_cost = cost + step_cost
+        f_cost = g_cost + heuristic(next_state, problem)
+        if f_cost > bound:
+            next_bound = min(next_bound, f_cost)
+            continue
+
+        actions.append(action)
+        if problem.is_goal_state(next_state):
+            return actions, next_bound, peak
+
+        successors = problem.get_successors(next_state)
+        fringe_size += len(successors)
+        peak = max(peak, fringe_size)
+        on_path.add(next_state)
+        stack.append((next_state, g_cost, iter(successors)))
+
+    return None, next_bound, peak
+
+
+def iterative_deepening_a_star(problem, heuristic=null_heuristic):
+    """Run IDA* on the given problem.
+
+    Repeats a depth-first search bounded by f = g + h, raising the bound to
+    the smallest f-cost that exceeded it, until a goal is found.  Memory use
+    is linear in the length of the path instead of growing with every
+    generated node, at the price of re-expanding states.  With an admissible
+    heuristic the returned path is optimal.
+
+    The largest number of successors held at once is stored on the problem
+    as _peak_fringe.
+    """
+    bound = heuristic(problem.get_start_state(), problem)
+    problem._peak_fringe = 0
+    while True:
+        actions, bound, peak = cost_bounded_search(problem, heuristic, bound)
+        problem._peak_fringe = max(problem._peak_fringe, peak)
+        if actions is not None:
+            return actions
+        if bound == float('inf'):
+            return None
+
+
+def recursive_best_first_search(problem, heuristic=null_heuristic):
+    """Run RBFS on the given problem.
+
+    Recursive best-first search expands nodes in best-first order while only
+    keeping the current path and the successors of the states on it.  When
+    the best successor exceeds the f-cost of the best alternative elsewhere
+    the recursion unwinds, backing up the successor's f-cost so the subtree
+    can be regenerated later.  With an admissible heuristic the returned
+    path is optimal.
+
+    The largest number of successors held at once is stored on the problem
+    as _peak_fringe.
+    """
+    start = problem.get_start_state()
+    problem._peak_fringe = 0
+    if problem.is_goal_state(start):
+        return []
+
+    on_path = set([start])
+    fringe_size = [0]
+
+    def search(state, cost, f_cost, f_limit):
+        """Return (actions from state to a goal or None, backed-up f-cost)."""
+        # successors are [f, generation order, g, state, action] so that
+        # sorting breaks ties between equal f-costs in a stable way
+        successors = []
+        for next_state, action, step_cost in problem.get_successors(state):
+            if next_state not in on_path:
+                g_cost = cost + step_cost
+                successors.append(
+                    [max(g_cost + heuristic(next_state, problem), f_cost),
+                     len(successors), g_cost, next_state, action])
+        if not successors:
+            return None, float('inf')
+
+        fringe_size[0] += len(successors)
+        problem._peak_fringe = max(problem._peak_fringe, fringe_size[0])
+        try:
+            while True:
+                successors.sort()
+                best = successors[0]
+                if best[0] > f_limit:
+                    return None, best[0]
+                if problem.is_goal_state(best[3]):
+                    return [best[4]], best[0]
+                if len(successors) > 1:
+                    alternative = successors[1][0]
+                else:
+                    alternative = float('inf')
+
+                on_path.add(best[3])
+                actions, best[0] = search(best[3], best[2], best[0],
+                                          min(f_limit, alternative))
+                on_path.discard(best[3])
+                if actions is not None:
+                    return [best[4]] + actions, best[0]
+        finally:
+            fringe_size[0] -= len(successors)
+
+    actions, _ = search(start, 0, heuristic(start, problem), float('inf'))
+    return actions
+
+
+class ReverseSearchProblem(SearchProblem):
+    """View of a single-goal search problem that searches from goal to start.
+
+    The wrapped problem must expose its goal state as problem.goal.  Its
+    successors are the predecessors of the wrapped problem: problem's own
+    get_predecessors(state) if it has one, otherwise get_successors(state)
+    with every action reversed through Actions.reverse_direction, which
+    assumes that actions are reversible at the same cost.  Each successor's
+    action is the action leading from it to state in the wrapped problem.
+
+    Any other attribute (walls, heuristic_info, ...) is read from the
+    wrapped problem, so heuristics written for it that estimate the
+    distance to problem.goal estimate the distance to its start here.
+    """
+
+    def __init__(self, problem):
+        """Wrap problem, which must have a goal attribute."""
+        if 'goal' not in dir(problem):
+            raise Exception('Bidirectional search needs a problem with a '
+                            'single goal attribute')
+        self.problem = problem
+        self.start_state = problem.goal
+        self.goal = problem.get_start_state()
+
+    def __getattr__(self, name):
+        """Read attributes not set here from the wrapped problem."""
+        return getattr(self.problem, name)
+
+    def get_start_state(self):
+        """Return the wrapped problem's goal."""
+        return self.start_state
+
+    def is_goal_state(self, state):
+        """Return True iff state is the wrapped problem's start state."""
+        return state == self.goal
+
+    def get_successors(self, state):
+        """Return (predecessor, action, step_cost) triples of state."""
+        if 'get_predecessors' in dir(self.problem):
+            return self.problem.get_predecessors(state)
+        from game import Actions
+        return [(predecessor, Actions.reverse_direction(action), step_cost)
+                for predecessor, action, step_cost
+                in self.problem.get_successors(state)]
+
+    def get_cost_of_actions(self, actions):
+        """Return the cost of actions, taken in the wrapped problem."""
+        return self.problem.get_cost_of_actions(actions)
+
+
+def join_paths(meeting, forward_links, backward_links):
+    """Return the actions of a path through meeting found from both ends.
+
+    forward_links maps each state reached from the start to (parent, action)
+    and backward_links maps each state reached from the goal to
+    (child, action), where action leads from the state to child; both map
+    their root to None.
+    """
+    actions = []
+    state = meeting
+    while forward_links[state] is not None:
+        state, action = forward_links[state]
+        actions.append(action)
+    actions.reverse()
+    state = meeting
+    while backward_links[state] is not None:
+        state, action = backward_links[state]
+        actions.append(action)
+    return actions
+
+
+def bidirectional_breadth_first_search(problem):
+    """Run a bidirectional BFS on a problem with a single goal state.
+
+    Breadth-first layers are grown alternately from the start and from
+    problem.goal (see ReverseSearchProblem), always growing the smaller
+    layer, until the two searches meet.  Like BFS this finds a path with the
+    fewest actions, while exploring roughly two balls of half the radius
+    instead of one ball of the full radius.
+    """
+    start = problem.get_start_state()
+    if problem.is_goal_state(start):
+        return []
+    reverse = ReverseSearchProblem(problem)
+
+    forward = (problem, {start: None}, {start: 0})
+    backward = (reverse, {problem.goal: None}, {problem.goal: 0})
+    layers = [[start], [problem.goal]]
+    while layers[0] and layers[1]:
+        side = 0 if len(layers[0]) <= len(layers[1]) else 1
+        search_problem, links, depths = (forward, backward)[side]
+        other_depths = (forward, backward)[1 - side][2]
+
+        # grow a whole layer, then keep the shortest of all its meetings
+        best_depth, meeting = None, None
+        next_layer = []
+        for state in layers[side]:
+            depth = depths[state] + 1
+            for next_state, action, _ in search_problem.get_successors(state):
+                if next_state not in links:
+                    links[next_state] = (state, action)
+                    depths[next_state] = depth
+                    next_layer.append(next_state)
+                    if next_state in other_depths:
+                        total = depth + other_depths[next_state]
+                        if best_depth is None or total < best_depth:
+                            best_depth, meeting = total, next_state
+        layers[side] = next_layer
+
+        if meeting is not None:
+            return join_paths(meeting, forward[1], backward[1])
+
+    return None
+
+
+def bidirectional_a_star_search(problem, heuristic=null_heuristic):
+    """Run a front-to-end bidirectional A* on a problem with a single goal.
+
+    One A* runs from the start towards problem.goal and another from the
+    goal towards the start on the ReverseSearchProblem, where heuristic is
+    handed the reversed problem so that it estimates the distance to the
+    start.  The side with the smaller fringe is expanded next.  Every time
+    the searches touch, the cheapest complete path seen so far is kept, and
+    the search stops once no fringe entry can lead to a cheaper one: when
+    the lowest f-cost on either fringe, or the sum of the lowest path costs
+    on both fringes, reaches its cost.  With admissible heuristics the
+    returned path is optimal.
+    """
+    import heapq
+    start = problem.get_start_state()
+    if problem.is_goal_state(start):
+        return []
+    reverse = ReverseSearchProblem(problem)
+
+    # each side is (problem, links, path costs, f-cost fringe, g-cost heap);
+    # the g-cost heap is lazily cleaned of entries no longer on the fringe
+    sides = []
+    for search_problem in (problem, reverse):
+        root = search_problem.get_start_state()
+        fringe = util.IndexedPriorityQueue()
+        fringe.push(root, heuristic(root, search_problem))
+        sides.append((search_problem, {root: None}, {root: 0}, fringe,
+                      [(0, root)]))
+
+    def min_cost(side):
+        """Return the lowest path cost of any state on the side's fringe."""
+        _, _, costs, fringe, cost_heap = side
+        while (cost_heap[0][1] not in fringe or
+               costs[cost_heap[0][1]] != cost_heap[0][0]):
+            heapq.heappop(cost_heap)
+        return cost_heap[0][0]
+
+    best_cost, meeting = float('inf'), None
+    while not sides[0][3].is_empty() and not sides[1][3].is_empty():
+        if (max(sides[0][3].get_min_priority(),
+                sides[1][3].get_min_priority()) >= best_cost or
+                min_cost(sides[0]) + min_cost(sides[1]) >= best_cost):
+            break
+
+        side = 0 if len(sides[0][3]) <= len(sides[1][3]) else 1
+        search_problem, links, costs, fringe, cost_heap = sides[side]
+        other_costs = sides[1 - side][2]
+
+        state = fringe.pop()
+        for next_state, action, step_cost in search_problem.get_successors(
+                state):
+            cost = costs[state] + step_cost
+            if next_state not in costs or cost < costs[next_state]:
+                costs[next_state] = cost
+                links[next_state] = (state, action)
+                if (next_state in other_costs and
+                        cost + other_costs[next_state] < best_cost):
+                    best_cost = cost + other_costs[next_state]
+                    meeting = next_state
+                f_cost = cost + heuristic(next_state, search_problem)
+                if f_cost < best_cost:
+                    fringe.push(next_state, f_cost)
+                    heapq.heappush(cost_heap, (cost, next_state))
+
+    if meeting is None:
+        return None
+    return join_paths(meeting, sides[0][1], sides[1][1])
+
+
+class JumpPointProblem(SearchProblem):
+    """Jump point view of a 4-connected, uniform-cost grid problem.
+
+    The wrapped problem's states must be (x, y) positions on its walls grid
+    with a cost of 1 per step, as in PositionSearchProblem with the default
+    cost_fn.  Among the many equally short paths through open areas only
+    the canonical ones, that move horizontally before turning vertically,
+    are searched:
+
+    - after a horizontal move the search may continue straight or turn
+      north or south;
+    - after a vertical move it may only continue straight, unless a wall
+      just behind a side cell means that cell could not have been reached
+      horizontally first (a forced neighbor).
+
+    Instead of one cell at a time, successors jump straight ahead to the
+    next jump point: a goal, a cell with a forced neighbor or, when moving
+    horizontally, a cell from which a vertical jump finds a jump point.
+    Corridors and open rooms alike are crossed in a single expansion.
+
+    States are (position, direction) pairs, direction being the direction
+    of the jump that arrived at position (None for the start).  Actions are
+    tuples of the Directions taken along a jump and step costs are their
+    lengths.
+    """
+
+    def __init__(self, problem):
+        """Wrap problem, which must have a walls attribute."""
+        self.problem = problem
+        self.jumps = {}
+
+    def __getattr__(self, name):
+        """Read attributes not set here from the wrapped problem."""
+        return getattr(self.problem, name)
+
+    def get_start_state(self):
+        """Return the wrapped problem's start position, arrived at by None."""
+        return (self.problem.get_start_state(), None)
+
+    def is_goal_state(self, state):
+        """Return True iff state's position is a goal of the problem."""
+        return self.problem.is_goal_state(state[0])
+
+    def is_open(self, x, y):
+        """Return True iff (x, y) is inside the grid and not a wall."""
+        walls = self.problem.walls
+        return (0 <= x < walls.width and 0 <= y < walls.height and
+                not walls[x][y])
+
+    def has_forced_neighbor(self, position, dy):
+        """Return True iff a vertical move dy into position must turn."""
+        x, y = position
+        for dx in (1, -1):
+            if self.is_open(x + dx, y) and not self.is_open(x + dx, y - dy):
+                return True
+        return False
+
+    def jump(self, position, direction):
+        """Return the next jump point from position in direction, or None.
+
+        Results are cached as they only depend on the walls and the goal.
+        """
+        key = (position, direction)
+        if key not in self.jumps:
+            from game import Actions, Directions
+            dx, dy = Actions._directions[direction]
+            x, y = position
+            point = None
+            while self.is_open(x + dx, y + dy):
+                x, y = x + dx, y + dy
+                if self.problem.is_goal_state((x, y)):
+                    point = (x, y)
+                    break
+                if dy:
+                    if self.has_forced_neighbor((x, y), dy):
+                        point = (x, y)
+                        break
+                elif (self.jump((x, y), Directions.NORTH) is not None or
+                      self.jump((x, y), Directions.SOUTH) is not None):
+                    point = (x, y)
+                    break
+            self.jumps[key] = point
+        return self.jumps[key]
+
+    def get_successors(self, state):
+        """Return ((jump point, direction), jump actions, length) triples."""
+        from game import Actions, Directions
+        position, arrival = state
+        if arrival is None:
+            directions = [Directions.NORTH, Directions.SOUTH,
+                          Directions.EAST, Directions.WEST]
+        elif arrival in (Directions.EAST, Directions.WEST):
+            directions = [arrival, Directions.NORTH, Directions.SOUTH]
+        else:
+            directions = [arrival]
+            dy = Actions._directions[arrival][1]
+            x, y = position
+            for direction in (Directions.EAST, Directions.WEST):
+                dx = Actions._directions[direction][0]
+                if (self.is_open(x + dx, y) and
+                        not self.is_open(x + dx, y - dy)):
+                    directions.append(direction)
+
+        successors = []
+        for direction in directions:
+            point = self.jump(position, direction)
+            if point is not None:
+                length = (abs(point[0] - position[0]) +
+                          abs(point[1] - position[1]))
+                successors.append(((point, direction),
+                                   (direction,) * length, length))
+
+        # Bookkeeping for display purposes, only jump points count
+        if '_expanded' in dir(self.problem):
+            self.problem._expanded += 1
+        if '_visited' in dir(self.problem) and position not in self._visited:
+            self.problem._visited[position] = True
+            self.problem._visitedlist.append(position)
+
+        return successors
+
+    def get_cost_of_actions(self, actions):
+        """Return the cost of a list of jumps in the wrapped problem."""
+        return self.problem.get_cost_of_actions(flatten_actions(actions))
+
+
+def flatten_actions(actions):
+    """Expand multi-step actions into a list of single-step actions.
+
+    Searches over jumps or corridor edges return actions that are tuples of
+    Directions; every tuple is replaced by its steps and other actions are
+    kept as they are.  None (no path found) is returned unchanged.
+    """
+    if actions is None:
+        return None
+    steps = []
+    for action in actions:
+        if isinstance(action, tuple):
+            steps.extend(action)
+        else:
+            steps.append(action)
+    return steps
+
+
+def jump_point_search(problem, heuristic=null_heuristic):
+    """Run A* with jump point search on a uniform-cost grid problem.
+
+    Searches the JumpPointProblem view of problem, so only jump points are
+    expanded, then expands the jumps back into the list of single-step
+    Directions.  heuristic is called with positions, as for problem, and
+    the path found is as short as the one A* finds on problem.
+    """
+    def position_heuristic(state, jump_problem):
+        return heuristic(state[0], problem)
+
+    return flatten_actions(
+        a_star_search(JumpPointProblem(problem), position_heuristic))
+
+
 # Abbreviations
 bfs = breadth_first_search
 dfs = depth_first_search
 a_star = a_star_search
 ucs = uniform_cost_search
+ida_star = iterative_deepening_a_star
+rbfs = recursive_best_first_search
+bi_bfs = bidirectional_breadth_first_search
+bi_a_star = bidirectional_a_star_search
+jps = jump_point_search
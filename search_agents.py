@@ -36,10 +36,15 @@ Pieter Abbeel (pabbeel@cs.berkeley.edu).
 from game import Directions
 from game import Agent
 from game import Actions
+from game import BitGrid
+from game import Grid
+from layout import MazeDistances
+from collections import deque
 import util
 import time
 import search
 import copy
+import functools
 
 
 class GoWestAgent(Agent):
@@ -79,13 +84,30 @@ class SearchAgent(Agent):
         breadth_first_search or bfs
         uniform_cost_search or ucs
         a_star_search or a_star
+        iterative_deepening_a_star or ida_star
+        recursive_best_first_search or rbfs
+        bidirectional_breadth_first_search or bi_bfs
+        bidirectional_a_star_search or bi_a_star
+        jump_point_search or jps
 
     Note: You should NOT change any code in SearchAgent
     """
 
+    # search.SearchStats of the last search, if run with stats set
+    search_stats = None
+
     def __init__(self, fn='depth_first_search', prob='PositionSearchProblem',
-                 heuristic='null_heuristic'):
-        """Create SearchAgent from search function, problem, and heuristic."""
+                 heuristic='null_heuristic', corridors=False, stats=False):
+        """Create SearchAgent from search function, problem, and heuristic.
+
+        If corridors is set (e.g. -a corridors=true), the problem is created
+        with corridors=True and searched on the layout's CorridorGraph.
+        Searches that ignore step costs (dfs, bfs, bi_bfs) then count whole
+        corridors as single moves, so bfs finds the plan with the fewest
+        corridors rather than the fewest steps.
+        If stats is set, the search is run through search.run_with_stats
+        and the collected search.SearchStats are printed.
+        """
         # Warning: some advanced Python magic is employed below to find the
         # right functions and problems
         if fn not in dir(search):
@@ -95,6 +117,7 @@ class SearchAgent(Agent):
         if 'heuristic' not in func.__code__.co_varnames:
             print(('[SearchAgent] using function ' + fn))
             self.search_function = func
+            heur = None
         else:
             if heuristic in list(globals().keys()):
                 heur = globals()[heuristic]
@@ -115,6 +138,22 @@ class SearchAgent(Agent):
                                  'in SearchAgents.py.')
         self.search_type = globals()[prob]
         print(('[SearchAgent] using problem type ' + prob))
+        if str(corridors).lower() in ('1', 'true'):
+            problem_type = self.search_type
+            self.search_type = lambda state: problem_type(state,
+                                                          corridors=True)
+            print('[SearchAgent] searching the corridor graph')
+            if func in (search.depth_first_search,
+                        search.breadth_first_search,
+                        search.bidirectional_breadth_first_search):
+                print('[SearchAgent] warning: %s ignores corridor lengths, '
+                      'plans may not be shortest' % fn)
+        if str(stats).lower() in ('1', 'true'):
+            def search_function(problem):
+                actions, self.search_stats = search.run_with_stats(
+                    func, problem, heur)
+                return actions
+            self.search_function = search_function
 
     def register_initial_state(self, state):
         """Register initial state of search problem.
@@ -132,12 +171,23 @@ class SearchAgent(Agent):
             raise Exception("No search function provided for SearchAgent")
         starttime = time.time()
         problem = self.search_type(state)  # Makes a new search problem
-        self.actions = self.search_function(problem)  # Find a path
+        # Find a path, expanding any multi-step actions into single steps
+        self.actions = search.flatten_actions(self.search_function(problem))
         total_cost = problem.get_cost_of_actions(self.actions)
         print('Path found with total cost of %d in %.1f seconds' %
               (total_cost, time.time() - starttime))
         if '_expanded' in dir(problem):
             print(('Search nodes expanded: %d' % problem._expanded))
+        if '_peak_fringe' in dir(problem):
+            print(('Peak fringe size: %d' % problem._peak_fringe))
+        for name, info in sorted(getattr(problem, 'heuristic_info',
+                                         {}).items()):
+            if isinstance(info, util.LRUCache):
+                print(('Heuristic %s: %d hits, %d misses, '
+                       '%d evictions' % (name, info.hits, info.misses,
+                                         info.evictions)))
+        if self.search_stats is not None:
+            print(self.search_stats)
 
     def get_action(self, state):
         """Return the next action in the path chosen in register_initial_state.
@@ -168,8 +218,11 @@ class PositionSearchProblem(search.SearchProblem):
     Note: this search problem is fully specified; you should NOT change it.
     """
 
+    # class default, so subclasses that skip __init__ search cell by cell
+    corridor_graph = None
+
     def __init__(self, game_state, cost_fn=lambda x: 1, goal=(1, 1),
-                 start=None, warn=True, visualize=True):
+                 start=None, warn=True, visualize=True, corridors=False):
         """Create PositionSearchProblem instance.
 
         Args:
@@ -177,6 +230,11 @@ class PositionSearchProblem(search.SearchProblem):
             cost_fn (function): A function from a search state (tuple)
                                 to a non-negative number
             goal: A position in the game_state
+            corridors: if True, successors follow the edges of the layout's
+                       CorridorGraph; actions are then tuples of Directions
+                       (see search.flatten_actions).  Step costs are the
+                       corridor lengths, so only cost-aware searches (ucs,
+                       a_star, ...) still find the shortest plans
         """
         self.walls = game_state.get_walls()
         self.start_state = game_state.get_pacman_position()
@@ -188,6 +246,9 @@ class PositionSearchProblem(search.SearchProblem):
         if warn and (game_state.get_num_food() != 1
                      or not game_state.has_food(*goal)):
             print('Warning: this does not look like a regular search maze')
+        if corridors:
+            self.corridor_graph = game_state.get_corridor_graph(
+                (self.start_state, goal))
 
         # For display purposes -- DO NOT CHANGE
         self._visited, self._visitedlist, self._expanded = {}, [], 0
@@ -228,6 +289,24 @@ class PositionSearchProblem(search.SearchProblem):
             required to get there, and 'step_cost' is the incremental
             cost of expanding to that successor
         """
+        if self.corridor_graph is not None:
+            successors = [
+                (end, actions, sum(self.cost_fn(cell) for cell in cells))
+                for end, actions, cells in
+                self.corridor_graph.get_edges(state)]
+        else:
+            successors = self.get_step_successors(state)
+
+        # Bookkeeping for display purposes
+        self._expanded += 1  # DO NOT CHANG
+        if state not in self._visited:
+            self._visited[state] = True
+            self._visitedlist.append(state)
+
+        return successors
+
+    def get_step_successors(self, state):
+        """Return the single-step (successor, action, step_cost) triples."""
         successors = []
         for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST,
                        Directions.WEST]:
@@ -238,14 +317,44 @@ class PositionSearchProblem(search.SearchProblem):
                 next_state = (next_x, next_y)
                 cost = self.cost_fn(next_state)
                 successors.append((next_state, action, cost))
+        return successors
+
+    def get_predecessors(self, state):
+        """Return predecessor states, the actions leaving them, and costs.
+
+        Used by the bidirectional searches to search backwards from the
+        goal.  Returns (predecessor, action, step_cost) triples, where action
+        leads from predecessor to state and step_cost is the cost of
+        entering state.
+        """
+        predecessors = []
+        cost = self.cost_fn(state)
+        if self.corridor_graph is not None:
+            # walk each edge backwards, entering its cells in reverse
+            for end, actions, cells in self.corridor_graph.get_edges(state):
+                predecessors.append((
+                    end,
+                    tuple(Actions.reverse_direction(action)
+                          for action in reversed(actions)),
+                    cost + sum(self.cost_fn(cell) for cell in cells[:-1])))
+        else:
+            x, y = state
+            for action in [Directions.NORTH, Directions.SOUTH,
+                           Directions.EAST, Directions.WEST]:
+                dx, dy = Actions.direction_to_vector(action)
+                prev_x, prev_y = int(x + dx), int(y + dy)
+                if not self.walls[prev_x][prev_y]:
+                    predecessors.append(
+                        ((prev_x, prev_y), Actions.reverse_direction(action),
+                         cost))
 
         # Bookkeeping for display purposes
-        self._expanded += 1  # DO NOT CHANG
+        self._expanded += 1
         if state not in self._visited:
             self._visited[state] = True
             self._visitedlist.append(state)
 
-        return successors
+        return predecessors
 
     def get_cost_of_actions(self, actions):
         """Return the cost of a particular sequence of actions.
@@ -326,8 +435,21 @@ class CornersProblem(search.SearchProblem):
     You must select a suitable state space and successor function!
     """
 
-    def __init__(self, starting_game_state, cost_fn=lambda x: 1):
-        """Store the walls, pacman's starting position and corners."""
+    def __init__(self, starting_game_state, cost_fn=lambda x: 1,
+                 corridors=False, packed=False):
+        """Store the walls, pacman's starting position and corners.
+
+        If corridors is True, successors follow the edges of the layout's
+        CorridorGraph; actions are then tuples of Directions (see
+        search.flatten_actions).  A corridor costs its length, so cost-unaware
+        searches such as bfs no longer find the shortest plans.
+
+        If packed is True, states are plain ints: the index of pacman's cell
+        times 16 plus a 4-bit mask of the corners visited so far (bit i for
+        self.corners[i]), and successors come from a precomputed move table.
+        Use get_position and get_unvisited_corners to read either kind of
+        state.
+        """
         self.walls = starting_game_state.get_walls()
         self.starting_position = starting_game_state.get_pacman_position()
 
@@ -340,8 +462,63 @@ class CornersProblem(search.SearchProblem):
             if not starting_game_state.has_food(*corner):
                 print('Warning: no food in corner ' + str(corner))
 
+        self.corridor_graph = None
+        if corridors:
+            self.corridor_graph = starting_game_state.get_corridor_graph(
+                (self.starting_position,) + self.corners)
+
+        self.packed = packed
+        if packed:
+            self._build_move_table()
+
         self._expanded = 0  # DO NOT CHANGE; Number of search nodes expanded
 
+    def _build_move_table(self):
+        """Index the open cells and tabulate the moves out of each of them.
+
+        moves[i] lists (next cell index * 16, corner bit of the next cell,
+        action, cost) for cell i, in the same order as the tuple states'
+        successors, so both representations search identically.
+        """
+        walls = self.walls
+        self.cells = [(x, y) for x in range(walls.width)
+                      for y in range(walls.height) if not walls[x][y]]
+        self.cell_index = dict((cell, i) for i, cell in enumerate(self.cells))
+
+        corner_bits = dict((corner, 1 << bit)
+                           for bit, corner in enumerate(self.corners))
+        self.moves = []
+        for cell in self.cells:
+            if self.corridor_graph is None:
+                edges = []
+                for action in [Directions.NORTH, Directions.SOUTH,
+                               Directions.EAST, Directions.WEST]:
+                    dx, dy = Actions.direction_to_vector(action)
+                    next_cell = (int(cell[0] + dx), int(cell[1] + dy))
+                    if not walls[next_cell[0]][next_cell[1]]:
+                        edges.append((next_cell, action, (next_cell,)))
+            elif self.corridor_graph.is_node(cell):
+                edges = self.corridor_graph.get_edges(cell)
+            else:
+                edges = []
+            self.moves.append([
+                (self.cell_index[end] << 4, corner_bits.get(end, 0), action,
+                 sum(self.cost_fn(entered) for entered in cells))
+                for end, action, cells in edges])
+
+    def get_position(self, state):
+        """Return pacman's (x, y) position in state."""
+        if self.packed:
+            return self.cells[state >> 4]
+        return state[0]
+
+    def get_unvisited_corners(self, state):
+        """Return the tuple of corners not yet visited in state."""
+        if self.packed:
+            return tuple(corner for bit, corner in enumerate(self.corners)
+                         if not state & (1 << bit))
+        return state[1]
+
     def get_start_state(self):
         """Return the start state for the search problem.
 
@@ -350,6 +527,8 @@ class CornersProblem(search.SearchProblem):
         Important:
             start state is in your state space, not the full Pacman state space
         """
+        if self.packed:
+            return self.cell_index[self.starting_position] << 4
         return self.starting_position, self.corners
 
     def is_goal_state(self, state):
@@ -357,6 +536,8 @@ class CornersProblem(search.SearchProblem):
 
         Overrides search.SearchProblem.is_goal_state
         """
+        if self.packed:
+            return state & 15 == 15
         # Check if corners array is empty
         return not state[1]
 
@@ -372,10 +553,29 @@ class CornersProblem(search.SearchProblem):
             required to get there, and 'step_cost' is the incremental
             cost of expanding to that successor
         """
+        if self.packed:
+            self._expanded += 1  # DO NOT CHANGE
+            mask = state & 15
+            return [(base | mask | bit, action, cost)
+                    for base, bit, action, cost in self.moves[state >> 4]]
+
         successors = []
         x, y = state[0]
         corners = state[1]
 
+        if self.corridor_graph is not None:
+            # corners are nodes of the graph, so only the end of an edge
+            # can be a corner
+            for end, actions, cells in self.corridor_graph.get_edges(state[0]):
+                next_corners = corners
+                if end in corners:
+                    next_corners = tuple(corner for corner in corners
+                                         if corner != end)
+                cost = sum(self.cost_fn(cell) for cell in cells)
+                successors.append(((end, next_corners), actions, cost))
+            self._expanded += 1  # DO NOT CHANGE
+            return successors
+
         for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST,
                        Directions.WEST]:
             # Add a successor state to the successor list if the action is
@@ -454,8 +654,8 @@ def corners_heuristic(state, problem):
     #   problem.walls  -- these are the walls of the maze, as a Grid (game.py)
 
     heuristic = 0
-    pos = copy.deepcopy(state[0])
-    corners = list(copy.deepcopy(state[1]))
+    pos = problem.get_position(state)
+    corners = list(problem.get_unvisited_corners(state))
 
     while corners:
 
@@ -484,7 +684,7 @@ class AStarCornersAgent(SearchAgent):
         """Create agent."""
         self.search_function = lambda prob: (
             search.a_star_search(prob, corners_heuristic))
-        self.search_type = CornersProblem
+        self.search_type = lambda state: CornersProblem(state, packed=True)
 
 
 class FoodSearchProblem(search.SearchProblem):
@@ -493,20 +693,34 @@ class FoodSearchProblem(search.SearchProblem):
     A search state in this problem is a tuple (pacman_position, food_grid)
     where
         pacman_position: a tuple (x,y) of integers specifying Pacman's position
-        food_grid: a Grid (see game.py) of either True or False,
+        food_grid: a BitGrid (see game.py) of either True or False,
                    specifying remaining food
     """
 
-    def __init__(self, starting_game_state):
-        """Create FoodSearchProblem instance with given starting state."""
-        self.start = (starting_game_state.get_pacman_position(),
-                      starting_game_state.get_food())
+    def __init__(self, starting_game_state, corridors=False):
+        """Create FoodSearchProblem instance with given starting state.
+
+        If corridors is True, successors follow the edges of the layout's
+        CorridorGraph, with every food cell kept as a node; actions are then
+        tuples of Directions (see search.flatten_actions).  A corridor costs
+        its length, so cost-unaware searches such as bfs no longer find the
+        shortest plans.
+        """
+        food = starting_game_state.get_food()
+        if not isinstance(food, BitGrid):
+            food = BitGrid.from_grid(food)
+        self.start = (starting_game_state.get_pacman_position(), food)
         self.walls = starting_game_state.get_walls()
         self.starting_game_state = starting_game_state
         self._expanded = 0  # DO NOT CHANGE
 
+        self.corridor_graph = None
+        if corridors:
+            self.corridor_graph = starting_game_state.get_corridor_graph(
+                [self.start[0]] + food.as_list())
+
         # A dictionary for the heuristic to store information
-        self.heuristic_info = {'distances': {}}
+        self.heuristic_info = {}
 
     def get_start_state(self):
         """Return the start state for the search problem.
@@ -520,7 +734,8 @@ class FoodSearchProblem(search.SearchProblem):
 
         Overrides search.SearchProblem.is_goal_state
         """
-        return state[1].count() == 0
+        # an empty BitGrid has no bits set, no need to count them
+        return not state[1].bits
 
     def get_successors(self, state):
         """Return list of successors from given state.
@@ -534,14 +749,29 @@ class FoodSearchProblem(search.SearchProblem):
         """
         successors = []
         self._expanded += 1  # DO NOT CHANGE
+        if self.corridor_graph is not None:
+            # food cells are nodes of the graph, so only the end of an edge
+            # can hold food
+            for end, actions, cells in self.corridor_graph.get_edges(state[0]):
+                next_food = state[1]
+                if next_food[end[0]][end[1]]:
+                    next_food = next_food.copy()
+                    next_food[end[0]][end[1]] = False
+                successors.append(((end, next_food), actions, len(cells)))
+            return successors
+
         for direction in [Directions.NORTH, Directions.SOUTH, Directions.EAST,
                           Directions.WEST]:
             x, y = state[0]
             dx, dy = Actions.direction_to_vector(direction)
             next_x, next_y = int(x + dx), int(y + dy)
             if not self.walls[next_x][next_y]:
-                next_food = state[1].copy()
-                next_food[next_x][next_y] = False
+                # food grids are never mutated once they are part of a
+                # state, so only copy when a pellet is actually eaten
+                next_food = state[1]
+                if next_food[next_x][next_y]:
+                    next_food = next_food.copy()
+                    next_food[next_x][next_y] = False
                 successors.append((((next_x, next_y), next_food), direction, 1))
         return successors
 
@@ -575,8 +805,174 @@ class AStarFoodSearchAgent(SearchAgent):
         self.search_type = FoodSearchProblem
 
 
+# Default number of entries kept by heuristic caches
+HEURISTIC_CACHE_SIZE = 100000
+
+
+def heuristic_cache_key(state, use_position=True):
+    """Return a cheap hashable key for a search state.
+
+    States holding a food grid, (position, food_grid), are keyed on the
+    grid's bitmask (packed from a plain Grid's contents first), together
+    with the position unless use_position is False.  The key is exact, so
+    grids with colliding hashes never share a cached value.  Other states
+    are used as their own key.
+    """
+    if (isinstance(state, tuple) and len(state) == 2 and
+            isinstance(state[1], Grid)):
+        food = state[1]
+        if not isinstance(food, BitGrid):
+            food = BitGrid.from_grid(food)
+        food_key = food.bits
+        if use_position:
+            return state[0], food_key
+        return food_key
+    return state
+
+
+def get_heuristic_cache(problem, name, max_size=HEURISTIC_CACHE_SIZE):
+    """Return the util.LRUCache stored as name in problem.heuristic_info.
+
+    The cache (and heuristic_info, for problems without one) is created on
+    first use.
+    """
+    if 'heuristic_info' not in dir(problem):
+        problem.heuristic_info = {}
+    if name not in problem.heuristic_info:
+        problem.heuristic_info[name] = util.LRUCache(max_size)
+    return problem.heuristic_info[name]
+
+
+def memoize_heuristic(max_size=HEURISTIC_CACHE_SIZE, use_position=True):
+    """Decorate a heuristic to cache its values in problem.heuristic_info.
+
+    Values are kept in a util.LRUCache named 'cache:' + the heuristic's name
+    and keyed by heuristic_cache_key, so at most max_size states are
+    remembered and cache.get_stats() reports hits and misses.  Only pass
+    use_position=False for heuristics that ignore pacman's position.
+    """
+    def decorate(heuristic):
+        name = 'cache:' + heuristic.__name__
+        missing = object()
+
+        @functools.wraps(heuristic)
+        def memoized(state, problem):
+            cache = get_heuristic_cache(problem, name, max_size)
+            key = heuristic_cache_key(state, use_position)
+            value = cache.get(key, missing)
+            if value is missing:
+                value = heuristic(state, problem)
+                cache.put(key, value)
+            return value
+        return memoized
+    return decorate
+
+
+class FoodDistances:
+    """Maze distances among the food of a FoodSearchProblem.
+
+    Built once per problem from the starting food and the layout's
+    MazeDistances: a food-to-food distance matrix, plus the column of every
+    pellet in the MazeDistances table so that the distances from any cell
+    to the food are direct table reads.  Bounds that only depend on the
+    remaining food are memoized by the food BitGrid's bitmask, in a
+    util.LRUCache of at most max_size entries.
+    """
+
+    def __init__(self, food_grid, maze_distances,
+                 max_size=HEURISTIC_CACHE_SIZE):
+        """Index the pellets of food_grid and tabulate their distances."""
+        self.maze_distances = maze_distances
+        self.food = food_grid.as_list()
+        height = food_grid.height
+        # BitGrid bit position of each pellet -> index into self.food
+        self.food_index = dict((x * height + y, i)
+                               for i, (x, y) in enumerate(self.food))
+        self.columns = [maze_distances.index[cell] for cell in self.food]
+        self.matrix = [[maze_distances.get_distance(a, b) for b in self.food]
+                       for a in self.food]
+        self.bounds = util.LRUCache(max_size)
+
+    def get_food_indices(self, bits):
+        """Return the indices of the pellets set in a food bitmask."""
+        indices = []
+        while bits:
+            low = bits & -bits
+            indices.append(self.food_index[low.bit_length() - 1])
+            bits ^= low
+        return indices
+
+    def get_distances_from(self, position, indices):
+        """Return the maze distances from position to the given pellets."""
+        table = self.maze_distances.table
+        start = self.maze_distances.index[position] * len(
+            self.maze_distances.cells)
+        columns = self.columns
+        return [table[start + columns[i]] for i in indices]
+
+    def get_bounds(self, bits):
+        """Return (indices, mst, farthest, pairs) for a food bitmask.
+
+        indices are the remaining pellets, mst the weight of their minimum
+        spanning tree, farthest the largest distance between two of them
+        and pairs the (i, j) positions in indices of the pairs that far
+        apart.  Results are memoized by bits.
+        """
+        bounds = self.bounds.get(bits)
+        if bounds is None:
+            indices = self.get_food_indices(bits)
+            bounds = (indices,) + self._spanning_bounds(indices)
+            self.bounds.put(bits, bounds)
+        return bounds
+
+    def _spanning_bounds(self, indices):
+        """Return (mst, farthest, pairs) for the pellets in indices."""
+        matrix = self.matrix
+        count = len(indices)
+        if count == 0:
+            return 0, 0, []
+
+        # Prim's algorithm on the dense distance matrix
+        in_tree = [False] * count
+        best = [float('inf')] * count
+        best[0] = 0
+        mst = 0
+        for _ in range(count):
+            node = min((k for k in range(count) if not in_tree[k]),
+                       key=best.__getitem__)
+            in_tree[node] = True
+            mst += best[node]
+            row = matrix[indices[node]]
+            for k in range(count):
+                if not in_tree[k] and row[indices[k]] < best[k]:
+                    best[k] = row[indices[k]]
+
+        farthest, pairs = 0, []
+        for i in range(count):
+            row = matrix[indices[i]]
+            for j in range(i + 1, count):
+                distance = row[indices[j]]
+                if distance > farthest:
+                    farthest, pairs = distance, [(i, j)]
+                elif distance == farthest:
+                    pairs.append((i, j))
+        return mst, farthest, pairs
+
+
+@memoize_heuristic()
 def food_heuristic(state, problem):
-    """Take the distance from pacman to the furthest piece of food.
+    """Return a lower bound on the steps needed to eat the remaining food.
+
+    The largest of three admissible and consistent bounds:
+        - the distance to the nearest pellet plus the weight of the minimum
+          spanning tree of the remaining food (any tour eating it all starts
+          by reaching some pellet and then spans every pellet);
+        - for the pellets farthest apart, the distance to the nearer of the
+          two plus the distance between them;
+        - the distance to the farthest pellet.
+    All distances are exact maze distances, read from a FoodDistances
+    table built once per problem; the food-only parts are memoized by the
+    food bitmask and whole values by memoize_heuristic.
 
     This heuristic must be consistent to ensure correctness.  First, try to
     come up with an admissible heuristic; almost all admissible heuristics will
@@ -603,29 +999,23 @@ def food_heuristic(state, problem):
     problem.heuristic_info['wall_count']
     """
     pac_pos, food_grid = state
-
-    # make food into something we can iterate over
-    food_array = food_grid.as_list()
-    heuristic = 0
-
-    for bite_pos in food_array:
-
-        # if we already have an entry for this combo, we use it
-        if (pac_pos, bite_pos) in problem.heuristic_info['distances']:
-            tmp_distance = \
-                problem.heuristic_info['distances'][(pac_pos, bite_pos)]
-
-        # otherwise we calculate the dist and add it to our dict
-        else:
-            tmp_distance = \
-                maze_distance(pac_pos, bite_pos, problem.starting_game_state)
-
-            problem.heuristic_info['distances'][(pac_pos, bite_pos)] = \
-                tmp_distance
-
-        # we want the furthest distance from pacman
-        heuristic = max(heuristic, tmp_distance)
-
+    if not isinstance(food_grid, BitGrid):
+        food_grid = BitGrid.from_grid(food_grid)
+
+    if 'food_distances' not in problem.heuristic_info:
+        problem.heuristic_info['food_distances'] = FoodDistances(
+            problem.get_start_state()[1],
+            problem.starting_game_state.get_maze_distances())
+    food_distances = problem.heuristic_info['food_distances']
+
+    indices, mst, farthest, pairs = food_distances.get_bounds(food_grid.bits)
+    if not indices:
+        return 0
+
+    to_food = food_distances.get_distances_from(pac_pos, indices)
+    heuristic = max(min(to_food) + mst, max(to_food))
+    for i, j in pairs:
+        heuristic = max(heuristic, min(to_food[i], to_food[j]) + farthest)
     return heuristic
 
 
@@ -648,6 +1038,137 @@ def find_path_to_closest_dot(game_state):
     return search.bfs(problem)
 
 
+class ClosestDotPlanner:
+    """Plan a whole closest-dot tour in one pass.
+
+    Does what repeatedly calling find_path_to_closest_dot and stepping the
+    game state along each segment does, but searches over maze cell indices
+    and an integer food bitmask only.  While food is dense each segment is
+    a short breadth first search.  Once few pellets are left, so that a
+    search would flood much of the maze, the layout's MazeDistances (shared
+    by every segment) gives the distance to every remaining pellet instead,
+    and a unique nearest pellet's path is read off the distance table; ties
+    still go to the search, so the same pellets are eaten in the same order
+    as by the BFS version.
+
+    A shortest path to the nearest pellet never crosses other food, so each
+    segment only eats its target.
+    """
+
+    def __init__(self, maze_distances):
+        """Build the single-step moves between the MazeDistances cells."""
+        self.maze_distances = maze_distances
+        self.cells = maze_distances.cells
+        self.index = maze_distances.index
+        self.size = len(self.cells)
+        self.moves = []
+        for x, y in self.cells:
+            moves = []
+            for action in [Directions.NORTH, Directions.SOUTH,
+                           Directions.EAST, Directions.WEST]:
+                dx, dy = Actions.direction_to_vector(action)
+                next_cell = (int(x + dx), int(y + dy))
+                if next_cell in self.index:
+                    moves.append((self.index[next_cell], action))
+            self.moves.append(tuple(moves))
+
+    def get_food_mask(self, food_grid):
+        """Return the bitmask of the cell indices holding food."""
+        mask = 0
+        for cell in food_grid.as_list():
+            mask |= 1 << self.index[cell]
+        return mask
+
+    def get_nearest(self, source, food):
+        """Return (distance, targets) for the nearest food from source.
+
+        targets lists the cell indices of every pellet at that distance;
+        it is empty if no food can be reached.
+        """
+        table = self.maze_distances.table
+        row = source * self.size
+        best, targets = MazeDistances.UNREACHABLE, []
+        while food:
+            low = food & -food
+            food ^= low
+            target = low.bit_length() - 1
+            distance = table[row + target]
+            if distance < best:
+                best, targets = distance, [target]
+            elif targets and distance == best:
+                targets.append(target)
+        return best, targets
+
+    def descend(self, source, target, distance):
+        """Return the actions of a shortest path read off the table."""
+        table = self.maze_distances.table
+        actions = []
+        while distance > 0:
+            distance -= 1
+            for cell, action in self.moves[source]:
+                if table[cell * self.size + target] == distance:
+                    source = cell
+                    actions.append(action)
+                    break
+        return actions
+
+    def breadth_first(self, source, food):
+        """Return (actions, target) to the food a BFS from source finds first.
+
+        Successors are generated in the order PositionSearchProblem uses,
+        so ties are broken exactly as search.breadth_first_search would.
+        """
+        parents = {source: None}
+        fringe = deque([source])
+        while fringe:
+            cell = fringe.popleft()
+            for next_cell, action in self.moves[cell]:
+                if next_cell not in parents:
+                    parents[next_cell] = (cell, action)
+                    if food >> next_cell & 1:
+                        actions = []
+                        target = next_cell
+                        while parents[next_cell] is not None:
+                            next_cell, action = parents[next_cell]
+                            actions.append(action)
+                        actions.reverse()
+                        return actions, target
+                    fringe.append(next_cell)
+        return None, None
+
+    def plan(self, start, food_grid):
+        """Return the actions eating all of food_grid from start, greedily.
+
+        Raises an Exception if some food cannot be reached.
+        """
+        source = self.index[start]
+        food = self.get_food_mask(food_grid) & ~(1 << source)
+        remaining = bin(food).count('1')
+        actions = []
+        while food:
+            # scanning the table costs one read per pellet, while a search
+            # expands about size / remaining cells before it finds one
+            targets = None
+            if remaining * remaining < self.size:
+                distance, targets = self.get_nearest(source, food)
+                if not targets:
+                    raise Exception('No path to the remaining food from %s'
+                                    % str(self.cells[source]))
+            if targets is not None and len(targets) == 1:
+                target = targets[0]
+                actions += self.descend(source, target, distance)
+            else:
+                segment, target = self.breadth_first(source, food)
+                if segment is None:
+                    raise Exception('No path to the remaining food from %s'
+                                    % str(self.cells[source]))
+                actions += segment
+            food &= ~(1 << target)
+            remaining -= 1
+            source = target
+        return actions
+
+
 class ClosestDotSearchAgent(SearchAgent):
     """Search for all food using a sequence of searches."""
 
@@ -674,17 +1195,22 @@ class ClosestDotSearchAgent(SearchAgent):
         Args:
             state: start state
         """
+        planner = ClosestDotPlanner(state.get_maze_distances())
+        self.actions = planner.plan(state.get_pacman_position(),
+                                    state.get_food())
+
+        # replay the whole plan through the game once to validate it
         current_state = state
-        while current_state.get_food().count() > 0:
-            next_path_segment = find_path_to_closest_dot(current_state)
-            self.actions += next_path_segment
-            for action in next_path_segment:
-                legal = current_state.get_legal_actions()
-                if action not in legal:
-                    raise Exception('find_path_to_closest_dot returned an '
-                                    + 'illegal move: %s!\n%s' %
-                                    (str(action), str(current_state)))
-                current_state = current_state.generate_successor(0, action)
+        for action in self.actions:
+            legal = current_state.get_legal_actions()
+            if action not in legal:
+                raise Exception('ClosestDotPlanner returned an '
+                                + 'illegal move: %s!\n%s' %
+                                (str(action), str(current_state)))
+            current_state = current_state.generate_successor(0, action)
+        if current_state.get_num_food() > 0:
+            raise Exception('ClosestDotPlanner left food uneaten!\n%s' %
+                            str(current_state))
         print('Path found with cost %d.' % len(self.actions))
 
 
@@ -733,7 +1259,8 @@ class AnyFoodSearchProblem(PositionSearchProblem):
 def maze_distance(point1, point2, game_state):
     """Return the maze distance between any two points.
 
-    Uses the search functions you have already built.
+    Looks the distance up in the MazeDistances oracle of the game_state's
+    layout, which is computed once per layout (see layout.MazeDistances).
     The game_state can be any game state -- Pacman's position in that state
     is ignored.
 
@@ -747,6 +1274,4 @@ def maze_distance(point1, point2, game_state):
     walls = game_state.get_walls()
     assert not walls[x1][y1], 'point1 is a wall: ' + str(point1)
     assert not walls[x2][y2], 'point2 is a wall: ' + str(point2)
-    prob = PositionSearchProblem(game_state, start=point1, goal=point2,
-                                 warn=False, visualize=False)
-    return len(search.bfs(prob))
+    return game_state.get_maze_distances().get_distance(point1, point2)
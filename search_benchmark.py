@@ -0,0 +1,318 @@
+"""Benchmark suite for the search algorithms in search.py.
+
+Runs every combination of search algorithm, search problem and layout,
+with warmup and repeated runs, and records the wall time, nodes expanded,
+peak memory and solution cost of each to a JSON file.  A previous results
+file can be given as a baseline to report slowdowns, extra expansions and
+changed solution costs.
+
+EightPuzzleSearchProblem does not use layouts; it is run on the puzzles of
+eight_puzzle.EIGHT_PUZZLE_DATA, named eight_puzzle_0 to eight_puzzle_5.
+
+Usage:
+    python search_benchmark.py [options]
+
+    python search_benchmark.py -p CornersProblem -l medium_corners,big_corners
+    python search_benchmark.py -o new.json -b baseline.json
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import eight_puzzle
+import layout
+import pacman
+import search
+import search_agents
+import util
+
+ALGORITHMS = ['dfs', 'bfs', 'ucs', 'a_star', 'ida_star', 'rbfs', 'bi_bfs',
+              'bi_a_star', 'jps']
+
+PROBLEMS = ['PositionSearchProblem', 'CornersProblem', 'FoodSearchProblem',
+            'EightPuzzleSearchProblem']
+
+# Heuristic handed to the algorithms that take one, by problem
+HEURISTICS = {
+    'PositionSearchProblem': search_agents.manhattan_heuristic,
+    'CornersProblem': search_agents.corners_heuristic,
+    'FoodSearchProblem': search_agents.food_heuristic,
+    'EightPuzzleSearchProblem': eight_puzzle.pattern_database_heuristic,
+}
+
+# Algorithms that need a single goal position on a grid
+POSITION_ONLY_ALGORITHMS = ['bi_bfs', 'bi_a_star', 'jps']
+
+PUZZLE_PREFIX = 'eight_puzzle_'
+
+
+def list_layouts():
+    """Return the names of the layouts in layouts/ and the eight puzzles."""
+    names = sorted(name[:-4] for name in os.listdir('layouts')
+                   if name.endswith('.lay'))
+    return names + [PUZZLE_PREFIX + str(i)
+                    for i in range(len(eight_puzzle.EIGHT_PUZZLE_DATA))]
+
+
+def get_problem_factory(problem_name, layout_name):
+    """Return a function creating fresh problems, or None if not applicable.
+
+    Pacman problems apply to the layouts in layouts/ and
+    EightPuzzleSearchProblem to the eight puzzles.
+    """
+    is_puzzle = layout_name.startswith(PUZZLE_PREFIX)
+    if problem_name == 'EightPuzzleSearchProblem':
+        if not is_puzzle:
+            return None
+        puzzle = eight_puzzle.load_eight_puzzle(
+            int(layout_name[len(PUZZLE_PREFIX):]))
+        return lambda: eight_puzzle.EightPuzzleSearchProblem(puzzle)
+    if is_puzzle:
+        return None
+
+    game_state = pacman.GameState()
+    game_state.initialize(layout.get_layout(layout_name), 0)
+    if problem_name == 'PositionSearchProblem':
+        return lambda: search_agents.PositionSearchProblem(
+            game_state, warn=False, visualize=False)
+    problem_type = getattr(search_agents, problem_name)
+    return lambda: problem_type(game_state)
+
+
+def get_search_function(algorithm, problem_name):
+    """Return a function solving a problem with algorithm, or None.
+
+    Algorithms that take a heuristic get the problem's entry in HEURISTICS.
+    """
+    if (algorithm in POSITION_ONLY_ALGORITHMS and
+            problem_name != 'PositionSearchProblem'):
+        return None
+    function = getattr(search, algorithm)
+    if 'heuristic' not in function.__code__.co_varnames:
+        return function
+    heuristic = HEURISTICS[problem_name]
+    return lambda problem: function(problem, heuristic=heuristic)
+
+
+def run_case(algorithm, problem_name, make_problem, warmup, repeats,
+             timeout):
+    """Benchmark one combination and return its result row.
+
+    Runs warmup untimed searches and repeats timed ones, then one search
+    through search.run_with_stats for the counts and one under tracemalloc
+    for the peak memory, each on a fresh problem and limited to timeout
+    seconds.  The row's status is 'ok', 'timeout' or 'error: <message>'.
+    """
+    search_function = get_search_function(algorithm, problem_name)
+    row = {'status': 'ok', 'time': None, 'mean_time': None,
+           'expanded': None, 'generated': None, 'peak_memory': None,
+           'cost': None}
+
+    def timed_run():
+        problem = make_problem()
+        start = time.perf_counter()
+        search_function(problem)
+        return time.perf_counter() - start
+
+    def counted_run():
+        problem = make_problem()
+        heuristic = None
+        function = getattr(search, algorithm)
+        if 'heuristic' in function.__code__.co_varnames:
+            heuristic = HEURISTICS[problem_name]
+        actions, stats = search.run_with_stats(function, problem, heuristic)
+        return problem, search.flatten_actions(actions), stats
+
+    def memory_run():
+        problem = make_problem()
+        tracemalloc.start()
+        try:
+            search_function(problem)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    try:
+        util.mute_print()
+        for _ in range(warmup):
+            util.TimeoutFunction(timed_run, timeout)()
+        times = [util.TimeoutFunction(timed_run, timeout)()
+                 for _ in range(repeats)]
+        problem, actions, stats = util.TimeoutFunction(counted_run,
+                                                       timeout)()
+        row['peak_memory'] = util.TimeoutFunction(memory_run, timeout)()
+    except util.TimeoutFunctionException:
+        row['status'] = 'timeout'
+        return row
+    except Exception as inst:
+        row['status'] = 'error: %s' % inst
+        return row
+    finally:
+        util.unmute_print()
+
+    row['time'] = min(times)
+    row['mean_time'] = sum(times) / len(times)
+    # problems keeping their own count also see searches that bypass
+    # get_successors, such as jump point search
+    if '_expanded' in dir(problem):
+        row['expanded'] = problem._expanded
+    else:
+        row['expanded'] = stats.expanded
+    row['generated'] = stats.generated
+    if actions is not None:
+        row['cost'] = problem.get_cost_of_actions(actions)
+    return row
+
+
+def run_benchmark(algorithms, problems, layouts, warmup=1, repeats=3,
+                  timeout=10):
+    """Run every applicable combination and return the list of result rows.
+
+    Prints one line per combination as it finishes.
+    """
+    rows = []
+    for layout_name in layouts:
+        for problem_name in problems:
+            make_problem = get_problem_factory(problem_name, layout_name)
+            if make_problem is None:
+                continue
+            for algorithm in algorithms:
+                if get_search_function(algorithm, problem_name) is None:
+                    continue
+                row = run_case(algorithm, problem_name, make_problem,
+                               warmup, repeats, timeout)
+                row.update({'algorithm': algorithm, 'problem': problem_name,
+                            'layout': layout_name})
+                rows.append(row)
+                print(format_row(row))
+    return rows
+
+
+def format_row(row):
+    """Return a one-line summary of a result row."""
+    name = '%-10s %-25s %-20s' % (row['algorithm'], row['problem'],
+                                  row['layout'])
+    if row['status'] != 'ok':
+        return '%s %s' % (name, row['status'])
+    return '%s %9.2f ms %9s exp %9s cost %9.1f KB' % (
+        name, row['time'] * 1000, row['expanded'], row['cost'],
+        row['peak_memory'] / 1024.0)
+
+
+def compare(rows, baseline_rows, tolerance=0.25, min_time=0.001):
+    """Return the list of regressions of rows against baseline_rows.
+
+    A combination regresses if it stopped finishing, its solution cost
+    changed, it expands more nodes, or its best time grew by more than
+    tolerance (a fraction) and by more than min_time seconds.
+    """
+    baseline = dict(((row['algorithm'], row['problem'], row['layout']), row)
+                    for row in baseline_rows)
+    regressions = []
+    for row in rows:
+        key = (row['algorithm'], row['problem'], row['layout'])
+        old = baseline.get(key)
+        if old is None or old['status'] != 'ok':
+            continue
+        name = ' '.join(key)
+        if row['status'] != 'ok':
+            regressions.append('%s: %s' % (name, row['status']))
+            continue
+        if row['cost'] != old['cost']:
+            regressions.append('%s: cost %s, was %s' %
+                               (name, row['cost'], old['cost']))
+        if (row['expanded'] is not None and old['expanded'] is not None and
+                row['expanded'] > old['expanded']):
+            regressions.append('%s: %d nodes expanded, was %d' %
+                               (name, row['expanded'], old['expanded']))
+        if (row['time'] > old['time'] * (1 + tolerance) and
+                row['time'] - old['time'] > min_time):
+            regressions.append('%s: %.2f ms, was %.2f ms' %
+                               (name, row['time'] * 1000,
+                                old['time'] * 1000))
+    return regressions
+
+
+def parse_list(option, choices):
+    """Return the comma-separated names in option, checked against choices.
+
+    An empty option selects every choice.
+    """
+    if not option:
+        return list(choices)
+    names = option.split(',')
+    for name in names:
+        if name not in choices:
+            raise Exception('Unknown name %s, expected one of: %s' %
+                            (name, ', '.join(choices)))
+    return names
+
+
+def main(argv):
+    """Parse arguments, run the benchmark, save and compare the results.
+
+    Exits with status 1 if the comparison with a baseline finds
+    regressions.
+    """
+    from optparse import OptionParser
+    parser = OptionParser('python search_benchmark.py [options]')
+    parser.add_option('-a', '--algorithms', dest='algorithms', default='',
+                      help='comma-separated search functions '
+                           '[Default: all]')
+    parser.add_option('-p', '--problems', dest='problems', default='',
+                      help='comma-separated problem classes [Default: all]')
+    parser.add_option('-l', '--layouts', dest='layouts', default='',
+                      help='comma-separated layouts [Default: all]')
+    parser.add_option('-w', '--warmup', dest='warmup', type='int',
+                      default=1,
+                      help='untimed runs per case [Default: %default]')
+    parser.add_option('-r', '--repeats', dest='repeats', type='int',
+                      default=3,
+                      help='timed runs per case, best is kept '
+                           '[Default: %default]')
+    parser.add_option('-t', '--timeout', dest='timeout', type='int',
+                      default=10,
+                      help='seconds allowed per run [Default: %default]')
+    parser.add_option('-o', '--output', dest='output',
+                      default='search_benchmark.json',
+                      help='file to write the results to '
+                           '[Default: %default]')
+    parser.add_option('-b', '--baseline', dest='baseline', default=None,
+                      help='results file to compare against')
+    parser.add_option('--tolerance', dest='tolerance', type='float',
+                      default=0.25,
+                      help='allowed fractional slowdown against the '
+                           'baseline [Default: %default]')
+    options, _ = parser.parse_args(argv)
+
+    algorithms = parse_list(options.algorithms, ALGORITHMS)
+    problems = parse_list(options.problems, PROBLEMS)
+    layouts = parse_list(options.layouts, list_layouts())
+
+    rows = run_benchmark(algorithms, problems, layouts, options.warmup,
+                         options.repeats, options.timeout)
+    with open(options.output, 'w') as f:
+        json.dump({'python': platform.python_version(),
+                   'warmup': options.warmup, 'repeats': options.repeats,
+                   'timeout': options.timeout, 'results': rows},
+                  f, indent=1, sort_keys=True)
+    print('Wrote %d results to %s' % (len(rows), options.output))
+
+    if options.baseline is not None:
+        with open(options.baseline) as f:
+            baseline_rows = json.load(f)['results']
+        regressions = compare(rows, baseline_rows, options.tolerance)
+        for regression in regressions:
+            print('REGRESSION %s' % regression)
+        print('%d regressions against %s' %
+              (len(regressions), options.baseline))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,297 @@
+"""Throughput benchmark for the game simulation loop in game.Game.run.
+
+Plays headless games (text_display.NullGraphics, no output) for every
+combination of pacman agent, ghost agent and layout, and reports:
+
+- moves per second, from an uninstrumented pass over the games
+- the split of the time per move between agent get_action,
+  generate_successor, state deep copies and rule processing, from a
+  second pass over the same games with those functions timed
+- the objects of the main game classes created per move
+
+Times are exclusive: deep copies made while generating a successor, or
+successors generated by an agent looking ahead, are only counted once.
+Results can be written to a JSON file and compared against a baseline.
+
+Usage:
+    python simulation_benchmark.py [options]
+
+    python simulation_benchmark.py -l medium_classic -n 10 -o sim.json
+    python simulation_benchmark.py -o new.json -b sim.json
+"""
+
+import json
+import platform
+import random
+import sys
+import time
+
+import game
+import ghost_agents
+import layout
+import pacman
+import pacman_agents
+import text_display
+
+SECTIONS = ['get_action', 'generate_successor', 'deep_copy', 'rules',
+            'other']
+
+# Classes whose instances are counted per move
+COUNTED_CLASSES = [pacman.GameState, game.GameStateData, game.AgentState,
+                   game.Configuration, game.Grid, layout.Layout]
+
+
+class SectionTimer:
+    """Exclusive wall time spent in named sections of code.
+
+    Sections nest: while an inner section runs, the time is charged to it
+    and not to the sections around it.
+    """
+
+    def __init__(self):
+        """Create a timer with no time charged to any section."""
+        self.totals = dict((name, 0.0) for name in SECTIONS)
+        self.stack = []
+        self.last = None
+
+    def enter(self, name):
+        """Start charging time to section name."""
+        now = time.perf_counter()
+        if self.stack:
+            self.totals[self.stack[-1]] += now - self.last
+        self.stack.append(name)
+        self.last = now
+
+    def exit(self):
+        """Stop charging time to the innermost section."""
+        now = time.perf_counter()
+        self.totals[self.stack.pop()] += now - self.last
+        self.last = now
+
+    def wrap(self, name, function):
+        """Return function with its calls charged to section name."""
+        def timed(*args, **kwargs):
+            self.enter(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.exit()
+        return timed
+
+
+class Instrumentation:
+    """Timers and instance counters patched into the game while active.
+
+    Used as a context manager; the original functions are restored on exit.
+    """
+
+    def __init__(self):
+        """Create the timer and counters, without patching anything yet."""
+        self.timer = SectionTimer()
+        self.created = {}
+        self.patches = []
+
+    def patch(self, owner, name, wrapper):
+        """Replace owner.name by wrapper(original), keeping staticmethods."""
+        original = owner.__dict__[name]
+        if isinstance(original, staticmethod):
+            patched = staticmethod(wrapper(original.__func__))
+        else:
+            patched = wrapper(original)
+        self.patches.append((owner, name, original))
+        setattr(owner, name, patched)
+
+    def count(self, function, name=None):
+        """Return function counting a creation of name (default the class).
+
+        Without a name the class is that of the first argument, so
+        subclasses constructed through an inherited __init__ are told apart.
+        """
+        created = self.created
+
+        def counted(*args, **kwargs):
+            key = name or type(args[0]).__name__
+            created[key] = created.get(key, 0) + 1
+            return function(*args, **kwargs)
+        return counted
+
+    def time_agent(self, agent):
+        """Charge agent's get_action calls to the get_action section."""
+        agent.get_action = self.timer.wrap('get_action', agent.get_action)
+
+    def __enter__(self):
+        """Patch the timers and counters into the game classes."""
+        timer = self.timer
+        self.patch(pacman.GameState, 'generate_successor',
+                   lambda f: timer.wrap('generate_successor', f))
+        for owner in (pacman.GameState, game.GameStateData, layout.Layout):
+            self.patch(owner, 'deep_copy',
+                       lambda f: timer.wrap('deep_copy', f))
+        self.patch(pacman.ClassicGameRules, 'process',
+                   lambda f: timer.wrap('rules', f))
+        for owner in (pacman.PacmanRules, pacman.GhostRules):
+            self.patch(owner, 'apply_action',
+                       lambda f: timer.wrap('rules', f))
+        self.patch(pacman.GhostRules, 'check_death',
+                   lambda f: timer.wrap('rules', f))
+        for owner in COUNTED_CLASSES:
+            self.patch(owner, '__init__', self.count)
+        # BitGrid copies skip __init__
+        self.patch(game.BitGrid, 'copy',
+                   lambda f: self.count(f, 'BitGrid'))
+        return self
+
+    def __exit__(self, *exc_info):
+        """Restore the original functions."""
+        for owner, name, original in reversed(self.patches):
+            setattr(owner, name, original)
+        self.patches = []
+
+
+def play_games(layout_name, pacman_name, ghost_name, num_games, seed,
+               instrumentation=None):
+    """Play num_games headless games and return (moves, seconds).
+
+    Game i is seeded with seed + i, so every pass plays the same games.
+    If instrumentation is given, the agents' get_action calls are timed.
+    """
+    game_layout = layout.get_layout(layout_name)
+    rules = pacman.ClassicGameRules()
+    moves = 0
+    seconds = 0.0
+    for i in range(num_games):
+        random.seed(seed + i)
+        pacman_agent = getattr(pacman_agents, pacman_name)()
+        ghosts = [getattr(ghost_agents, ghost_name)(index + 1)
+                  for index in range(game_layout.get_num_ghosts())]
+        if instrumentation is not None:
+            for agent in [pacman_agent] + ghosts:
+                instrumentation.time_agent(agent)
+        current_game = rules.new_game(game_layout, pacman_agent, ghosts,
+                                      text_display.NullGraphics(),
+                                      quiet=True)
+        start = time.perf_counter()
+        current_game.run()
+        seconds += time.perf_counter() - start
+        moves += len(current_game.move_history)
+    return moves, seconds
+
+
+def run_case(layout_name, pacman_name, ghost_name, num_games, seed):
+    """Benchmark one combination and return its result row."""
+    moves, seconds = play_games(layout_name, pacman_name, ghost_name,
+                                num_games, seed)
+    with Instrumentation() as instrumentation:
+        _, profiled_seconds = play_games(layout_name, pacman_name,
+                                         ghost_name, num_games, seed,
+                                         instrumentation)
+    totals = instrumentation.timer.totals
+    totals['other'] = max(0.0, profiled_seconds - sum(totals.values()))
+    return {
+        'layout': layout_name, 'pacman': pacman_name, 'ghost': ghost_name,
+        'games': num_games, 'moves': moves, 'seconds': seconds,
+        'moves_per_second': moves / seconds,
+        'split': dict((name, totals[name] / profiled_seconds)
+                      for name in SECTIONS),
+        'created_per_move': dict(
+            (name, count / float(moves))
+            for name, count in sorted(instrumentation.created.items())),
+    }
+
+
+def format_row(row):
+    """Return a multi-line summary of a result row."""
+    lines = ['%-18s %-14s %-16s %7d moves %10.0f moves/s' %
+             (row['layout'], row['pacman'], row['ghost'], row['moves'],
+              row['moves_per_second'])]
+    lines.append('    time: ' + ', '.join(
+        '%s %.0f%%' % (name, 100 * row['split'][name]) for name in SECTIONS))
+    lines.append('    created per move: ' + ', '.join(
+        '%s %.1f' % item for item in sorted(row['created_per_move'].items())))
+    return '\n'.join(lines)
+
+
+def compare(rows, baseline_rows, tolerance=0.1):
+    """Return the list of slowdowns of rows against baseline_rows.
+
+    A combination slows down if its moves per second dropped by more than
+    tolerance (a fraction) of the baseline's.
+    """
+    baseline = dict(((row['layout'], row['pacman'], row['ghost']), row)
+                    for row in baseline_rows)
+    regressions = []
+    for row in rows:
+        key = (row['layout'], row['pacman'], row['ghost'])
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if row['moves_per_second'] < old['moves_per_second'] * (1 - tolerance):
+            regressions.append('%s: %.0f moves/s, was %.0f moves/s' %
+                               (' '.join(key), row['moves_per_second'],
+                                old['moves_per_second']))
+    return regressions
+
+
+def main(argv):
+    """Parse arguments, run the benchmark, save and compare the results.
+
+    Exits with status 1 if the comparison with a baseline finds slowdowns.
+    """
+    from optparse import OptionParser
+    parser = OptionParser('python simulation_benchmark.py [options]')
+    parser.add_option('-l', '--layouts', dest='layouts',
+                      default='original_classic,medium_classic,'
+                              'contest_classic',
+                      help='comma-separated layouts [Default: %default]')
+    parser.add_option('-p', '--pacman', dest='pacman',
+                      default='LeftTurnAgent,GreedyAgent',
+                      help='comma-separated agents from pacman_agents.py '
+                           '[Default: %default]')
+    parser.add_option('-g', '--ghosts', dest='ghosts',
+                      default='RandomGhost,DirectionalGhost',
+                      help='comma-separated agents from ghost_agents.py '
+                           '[Default: %default]')
+    parser.add_option('-n', '--num_games', dest='num_games', type='int',
+                      default=5,
+                      help='games per combination [Default: %default]')
+    parser.add_option('-s', '--seed', dest='seed', type='int', default=0,
+                      help='seed of the first game [Default: %default]')
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help='file to write the results to')
+    parser.add_option('-b', '--baseline', dest='baseline', default=None,
+                      help='results file to compare against')
+    parser.add_option('--tolerance', dest='tolerance', type='float',
+                      default=0.1,
+                      help='allowed fractional drop in moves per second '
+                           'against the baseline [Default: %default]')
+    options, _ = parser.parse_args(argv)
+
+    rows = []
+    for layout_name in options.layouts.split(','):
+        for pacman_name in options.pacman.split(','):
+            for ghost_name in options.ghosts.split(','):
+                row = run_case(layout_name, pacman_name, ghost_name,
+                               options.num_games, options.seed)
+                rows.append(row)
+                print(format_row(row))
+
+    if options.output is not None:
+        with open(options.output, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'results': rows}, f, indent=1, sort_keys=True)
+        print('Wrote %d results to %s' % (len(rows), options.output))
+
+    if options.baseline is not None:
+        with open(options.baseline) as f:
+            baseline_rows = json.load(f)['results']
+        regressions = compare(rows, baseline_rows, options.tolerance)
+        for regression in regressions:
+            print('REGRESSION %s' % regression)
+        print('%d regressions against %s' %
+              (len(regressions), options.baseline))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -22,6 +22,7 @@ import inspect
 import heapq
 import random
 from collections import deque
+from collections import OrderedDict
 import signal
 import time
 
@@ -215,6 +216,10 @@ class Stack:
         """Return true iff the stack is empty."""
         return len(self.list) == 0
 
+    def __len__(self):
+        """Return the number of items on the stack."""
+        return len(self.list)
+
 
 class Queue(Stack):
     """A container with a first-in-first-out (FIFO) queuing policy."""
@@ -264,6 +269,10 @@ class PriorityQueue:
         """Return true iff the priority queue is empty."""
         return len(self.heap) == 0
 
+    def __len__(self):
+        """Return the number of entries in the queue."""
+        return len(self.heap)
+
     def update(self, item, priority):
         """Update the priority of given item.
 
@@ -309,6 +318,200 @@ class PriorityQueueWithFunction(PriorityQueue):
         super().push(item, self.priority_function(item))
 
 
+class IndexedPriorityQueue:
+    """Implements an indexed binary heap with decrease-key.
+
+    Each key appears in the queue at most once.  Alongside the heap a
+    dictionary maps every key to its position in the heap, so push, pop and
+    decrease_key all run in O(log n) instead of the O(n) scan done by
+    PriorityQueue.update.
+
+    Ties between equal priorities are broken first-in-first-out, and an
+    entry whose priority is decreased counts as freshly pushed, which
+    matches the order PriorityQueue would pop the same items in.
+    """
+
+    def __init__(self):
+        """Create an empty IndexedPriorityQueue."""
+        self.heap = []
+        self.index = {}
+        self.count = 0
+
+    def push(self, key, priority, item=None):
+        """Enqueue key with given priority, or lower its priority if present.
+
+        If the key is already in the queue with an equal or lower priority
+        nothing happens.
+
+        Args:
+            key: hashable identity of the entry
+            priority: priority of the entry
+            item: value returned by pop (defaults to key)
+        """
+        if item is None:
+            item = key
+        if key in self.index:
+            self.decrease_key(key, priority, item)
+            return
+        entry = [priority, self.count, key, item]
+        self.count += 1
+        self.index[key] = len(self.heap)
+        self.heap.append(entry)
+        self._sift_up(len(self.heap) - 1)
+
+    def pop(self):
+        """Pop the item with the lowest priority."""
+        heap = self.heap
+        last = heap.pop()
+        if heap:
+            entry = heap[0]
+            heap[0] = last
+            self.index[last[2]] = 0
+            self._sift_down(0)
+        else:
+            entry = last
+        del self.index[entry[2]]
+        return entry[3]
+
+    def decrease_key(self, key, priority, item=None):
+        """Lower the priority of key, replacing its item if one is given.
+
+        Does nothing if the key already has an equal or lower priority.
+        """
+        position = self.index[key]
+        entry = self.heap[position]
+        if entry[0] <= priority:
+            return
+        entry[0] = priority
+        entry[1] = self.count
+        self.count += 1
+        if item is not None:
+            entry[3] = item
+        self._sift_up(position)
+
+    def update(self, key, priority):
+        """Update the priority of key (same contract as PriorityQueue)."""
+        self.push(key, priority)
+
+    def get_priority(self, key):
+        """Return the current priority of key."""
+        return self.heap[self.index[key]][0]
+
+    def get_min_priority(self):
+        """Return the lowest priority in the queue without popping it."""
+        return self.heap[0][0]
+
+    def is_empty(self):
+        """Return true iff the priority queue is empty."""
+        return len(self.heap) == 0
+
+    def __contains__(self, key):
+        """Return true iff key is in the queue."""
+        return key in self.index
+
+    def __len__(self):
+        """Return the number of entries in the queue."""
+        return len(self.heap)
+
+    def _sift_up(self, position):
+        """Move the entry at position towards the root until it fits."""
+        heap, index = self.heap, self.index
+        entry = heap[position]
+        priority, count = entry[0], entry[1]
+        while position > 0:
+            parent_position = (position - 1) >> 1
+            parent = heap[parent_position]
+            if priority > parent[0] or (priority == parent[0] and
+                                        count > parent[1]):
+                break
+            heap[position] = parent
+            index[parent[2]] = position
+            position = parent_position
+        heap[position] = entry
+        index[entry[2]] = position
+
+    def _sift_down(self, position):
+        """Move the entry at position towards the leaves until it fits."""
+        heap, index = self.heap, self.index
+        size = len(heap)
+        entry = heap[position]
+        priority, count = entry[0], entry[1]
+        child_position = 2 * position + 1
+        while child_position < size:
+            child = heap[child_position]
+            right_position = child_position + 1
+            if right_position < size:
+                right = heap[right_position]
+                if right[0] < child[0] or (right[0] == child[0] and
+                                           right[1] < child[1]):
+                    child_position, child = right_position, right
+            if priority < child[0] or (priority == child[0] and
+                                       count < child[1]):
+                break
+            heap[position] = child
+            index[child[2]] = position
+            position = child_position
+            child_position = 2 * position + 1
+        heap[position] = entry
+        index[entry[2]] = position
+
+
+class LRUCache:
+    """A size-bounded cache that evicts the least recently used entry.
+
+    Keeps hit, miss and eviction counts so that callers can judge how well
+    the cache works.  With max_size None the cache is unbounded.
+    """
+
+    def __init__(self, max_size=None):
+        """Create an empty cache holding at most max_size entries."""
+        self.max_size = max_size
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the value cached for key (default if absent).
+
+        Counts a hit or a miss and marks key as most recently used.
+        """
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Cache value for key, evicting the least recently used if full."""
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if self.max_size is not None and len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (the statistics are kept)."""
+        self.data.clear()
+
+    def get_stats(self):
+        """Return a dict with the size, max_size, hits, misses, evictions."""
+        return {'size': len(self.data), 'max_size': self.max_size,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+    def __contains__(self, key):
+        """Return true iff key is cached (does not count as a hit)."""
+        return key in self.data
+
+    def __len__(self):
+        """Return the number of cached entries."""
+        return len(self.data)
+
+
 def manhattan_distance(xy1, xy2):
     """Return the Manhattan distance between points xy1 and xy2."""
     return abs(xy1[0] - xy2[0]) + abs(xy1[1] - xy2[1])